@@ -4,6 +4,7 @@ import dateparser
 from datetime import datetime, timedelta
 from dateutil.relativedelta import relativedelta
 from typing import Optional, Tuple
+import tracing
 
 class EnhancedDateParser:
     """Handles natural language date parsing with improved relative date support"""
@@ -11,6 +12,7 @@ class EnhancedDateParser:
     def __init__(self):
         self.now = datetime.now()
         
+    @tracing.traced("booking.parse_date")
     def parse_natural_date(self, date_str: str) -> Optional[datetime]:
         """Parse natural language dates with better relative date handling"""
         try:
@@ -118,6 +120,7 @@ class BookingSystem:
         except:
             return False, "Invalid date format. Please try again."
     
+    @tracing.traced("booking.save")
     def save_booking(self, intent: str, name: str, phone: str, email: str, date_str: str):
         """Save booking to the appropriate table"""
         timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
@@ -147,6 +150,7 @@ class Chatbot:
         return ("Hello! I'm your booking assistant. Do you want us to call you "
                 "or would you like to book an appointment?")
     
+    @tracing.traced("chatbot.turn")
     def handle_response(self, user_input: str) -> Tuple[str, bool]:
         """Process user input and return bot response + completion flag"""
         user_input = user_input.strip().lower()
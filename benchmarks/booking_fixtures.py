@@ -0,0 +1,80 @@
+"""Generate a large synthetic bookings database for report benchmarks"""
+import os
+import random
+import sqlite3
+import argparse
+from datetime import datetime, timedelta
+
+FIRST_NAMES = ["Jane", "John", "Priya", "Ana", "Kofi", "Mei", "Omar", "Lena", "Ravi", "Sara", "Tom", "Yuki"]
+LAST_NAMES = ["Doe", "Smith", "Patel", "Lima", "Mensah", "Chen", "Haddad", "Novak", "Kumar", "Berg", "Reyes"]
+DOMAINS = ["example.com", "example.org", "example.net", "mail.example"]
+
+SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS call_requests (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        phone TEXT NOT NULL,
+        email TEXT NOT NULL,
+        call_date TEXT NOT NULL,
+        timestamp TEXT NOT NULL)""",
+    """CREATE TABLE IF NOT EXISTS appointments (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        phone TEXT NOT NULL,
+        email TEXT NOT NULL,
+        appointment_date TEXT NOT NULL,
+        timestamp TEXT NOT NULL)""",
+]
+
+
+def _rows(rng: random.Random, count: int, customers: int, start: datetime):
+    for _ in range(count):
+        customer = rng.randrange(customers)
+        first = FIRST_NAMES[customer % len(FIRST_NAMES)]
+        last = LAST_NAMES[customer % len(LAST_NAMES)]
+        digits = f"{9800000000 + customer}"
+        # Same customer, differently formatted contact details
+        phone = rng.choice([digits, f"+{digits[:3]} {digits[3:6]}-{digits[6:]}", f"({digits[:3]}) {digits[3:]}"])
+        email = f"{first}.{last}{customer}@{DOMAINS[customer % len(DOMAINS)]}"
+        if rng.random() < 0.2:
+            email = email.upper()
+        created = start + timedelta(seconds=rng.randrange(365 * 86400))
+        booked = created + timedelta(days=rng.randrange(1, 90))
+        yield (f"{first} {last}", phone, email, booked.strftime("%Y-%m-%d"), created.strftime("%Y-%m-%d %H:%M:%S"))
+
+
+def generate(path: str, rows_per_table: int, seed: int = 7, batch: int = 50000):
+    """Create (or replace) a bookings database with `rows_per_table` rows in each table"""
+    if os.path.exists(path):
+        os.remove(path)
+    rng = random.Random(seed)
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode = OFF")
+    conn.execute("PRAGMA synchronous = OFF")
+    for statement in SCHEMA:
+        conn.execute(statement)
+
+    customers = max(1, rows_per_table // 3)
+    start = datetime.now() - timedelta(days=300)
+    for table, date_col in (("call_requests", "call_date"), ("appointments", "appointment_date")):
+        rows = _rows(rng, rows_per_table, customers, start)
+        while True:
+            chunk = [row for _, row in zip(range(batch), rows)]
+            if not chunk:
+                break
+            conn.executemany(
+                f"INSERT INTO {table} (name, phone, email, {date_col}, timestamp) VALUES (?, ?, ?, ?, ?)",
+                chunk,
+            )
+    conn.commit()
+    conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a large synthetic bookings database")
+    parser.add_argument("path", nargs="?", default="bookings_large.db")
+    parser.add_argument("--rows", type=int, default=1000000, help="Rows per table")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    generate(args.path, args.rows, args.seed)
+    print(f"Wrote {args.rows} rows per table to {args.path}")
@@ -0,0 +1,116 @@
+"""Deterministic synthetic PDFs for the offline benchmark suite"""
+import random
+import textwrap
+
+TOPICS = [
+    ("Installation", ["mounting bracket", "power supply", "cable routing", "wall anchor", "torque setting"]),
+    ("Calibration", ["reference sensor", "offset value", "drift check", "calibration code", "warm-up period"]),
+    ("Maintenance", ["filter cartridge", "inspection interval", "seal kit", "lubricant grade", "service log"]),
+    ("Troubleshooting", ["error code", "status light", "reset sequence", "fault relay", "diagnostic port"]),
+    ("Safety", ["protective earth", "lockout procedure", "thermal cutoff", "emergency stop", "rated voltage"]),
+    ("Networking", ["static address", "firmware image", "gateway port", "heartbeat timeout", "TLS certificate"]),
+]
+
+VERBS = ["requires", "controls", "limits", "reports", "protects", "depends on", "overrides", "monitors"]
+ADJECTIVES = ["primary", "secondary", "external", "internal", "optional", "redundant", "default", "manual"]
+
+LINES_PER_PAGE = 58
+CHARS_PER_LINE = 92
+
+
+def _sentence(rng: random.Random, terms: list) -> str:
+    subject, obj = rng.sample(terms, 2)
+    return (f"The {rng.choice(ADJECTIVES)} {subject} {rng.choice(VERBS)} the "
+            f"{rng.choice(ADJECTIVES)} {obj} during normal operation.")
+
+
+def make_corpus(num_pages: int, seed: int = 7):
+    """Build page text plus (question, answer, page) probes for retrieval checks.
+
+    Every page belongs to one topic and carries one unique, searchable fact.
+    """
+    rng = random.Random(seed)
+    pages, probes = [], []
+
+    for page_no in range(num_pages):
+        topic, terms = TOPICS[page_no % len(TOPICS)]
+        unit = f"unit {page_no + 1}"
+        value = f"{rng.randint(100, 999)}-{rng.choice('ABCDEFGH')}{rng.randint(10, 99)}"
+        term = rng.choice(terms)
+        fact = f"For {unit}, the {term} must be set to {value} before the first start."
+
+        paragraphs = [f"Section {page_no + 1}: {topic}"]
+        for p in range(rng.randint(3, 5)):
+            sentences = [_sentence(rng, terms) for _ in range(rng.randint(4, 8))]
+            if p == 1:
+                sentences.insert(rng.randint(0, len(sentences)), fact)
+            paragraphs.append(" ".join(sentences))
+
+        pages.append("\n\n".join(paragraphs))
+        probes.append({
+            "question": f"What value should the {term} be set to for {unit}?",
+            "answer": value,
+            "page": page_no,
+        })
+
+    return pages, probes
+
+
+def _escape(line: str) -> str:
+    return line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def _page_stream(text: str) -> bytes:
+    lines = []
+    for paragraph in text.split("\n\n"):
+        lines.extend(textwrap.wrap(paragraph, CHARS_PER_LINE) or [""])
+        lines.append("")
+    lines = lines[:LINES_PER_PAGE]
+
+    ops = ["BT", "/F1 10 Tf", "12 TL", "50 780 Td"]
+    for line in lines:
+        ops.append(f"({_escape(line)}) Tj T*")
+    ops.append("ET")
+    return "\n".join(ops).encode("latin-1", "replace")
+
+
+def write_pdf(path: str, pages: list):
+    """Write a minimal text-only PDF with one page per entry in `pages`"""
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # Page tree, filled in once page object numbers are known
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    page_refs = []
+    for text in pages:
+        stream = _page_stream(text)
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        content_no = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_no
+        )
+        page_refs.append(b"%d 0 R" % len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (b" ".join(page_refs), len(page_refs))
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+
+    xref_at = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        out += b"%010d 00000 n \n" % offset
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref_at)
+
+    with open(path, "wb") as f:
+        f.write(out)
+
+
+def write_synthetic_pdf(path: str, num_pages: int, seed: int = 7) -> list:
+    """Generate a synthetic manual and return its retrieval probes"""
+    pages, probes = make_corpus(num_pages, seed)
+    write_pdf(path, pages)
+    return probes
@@ -0,0 +1,537 @@
+"""Offline performance suite for the assistant.
+
+Each stage runs in its own Python process so peak RSS is attributable to
+that stage. Network calls go to the local stub server, which replays the
+recorded fixtures. The sentence-transformers model must already be in the
+local Hugging Face cache; the workers run with HF_HUB_OFFLINE=1.
+
+    python benchmarks/run_benchmarks.py                  # run and compare to baseline
+    python benchmarks/run_benchmarks.py --save-baseline  # record a new baseline
+"""
+import os
+import sys
+import json
+import glob
+import time
+import argparse
+import tempfile
+import subprocess
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCH_DIR)
+FIXTURES_DIR = os.path.join(BENCH_DIR, "fixtures")
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, "baseline.json")
+BOOKING_ROWS = 200000      # Rows per table in the generated bookings database
+RECALL_TOLERANCE = 0.02  # Absolute drop allowed in *_recall quality metrics
+REINDEX_PAGES = 300      # Size of the manual edited by the pdf_reindex stage
+
+sys.path.insert(0, REPO_ROOT)
+sys.path.insert(0, BENCH_DIR)
+
+STAGES = {}
+
+
+def stage(name: str, unit: str):
+    """Register a benchmark stage.
+
+    The function returns (latencies, items processed) and optionally a dict
+    of extra metrics; extras whose name ends in "_recall" are checked
+    against the baseline as quality metrics.
+    """
+    def decorator(func):
+        STAGES[name] = (func, unit)
+        return func
+    return decorator
+
+
+# ---------------------------------------------------------------------------
+# Worker side
+# ---------------------------------------------------------------------------
+
+def _peak_rss_mb() -> float:
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+    except ImportError:
+        import psutil
+        info = psutil.Process().memory_info()
+        return getattr(info, "peak_wset", info.rss) / (1024 * 1024)
+
+
+def _timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+
+def _pdf_paths(work_dir: str) -> list:
+    with open(os.path.join(work_dir, "pdfs.json")) as f:
+        return json.load(f)
+
+
+@stage("pdf_extract", unit="pdfs")
+def bench_pdf_extract(work_dir: str, repeat: int):
+    import pdf_qa
+    latencies, items = [], 0
+    for _ in range(repeat):
+        for path in _pdf_paths(work_dir):
+            elapsed, chunks = _timed(pdf_qa.extract_token_chunks, path)
+            latencies.append(elapsed)
+            items += 1
+    return latencies, items
+
+
+@stage("pdf_index", unit="chunks")
+def bench_pdf_index(work_dir: str, repeat: int):
+    import pdf_qa
+    chunk_sets = [pdf_qa.extract_token_chunks(path) for path in _pdf_paths(work_dir)]
+    latencies, items = [], 0
+    for _ in range(repeat):
+        for chunks in chunk_sets:
+            elapsed, ok = _timed(pdf_qa.build_vector_index, chunks)
+            if not ok:
+                raise RuntimeError("build_vector_index failed")
+            latencies.append(elapsed)
+            items += len(chunks)
+    return latencies, items
+
+
+@stage("pdf_retrieve", unit="queries")
+def bench_pdf_retrieve(work_dir: str, repeat: int):
+    import pdf_qa
+    with open(os.path.join(work_dir, "probes.json")) as f:
+        probes = json.load(f)
+    pdf_qa.build_vector_index(pdf_qa.extract_token_chunks(_pdf_paths(work_dir)[0]))
+
+    latencies = []
+    for _ in range(repeat):
+        for probe in probes:
+            elapsed, _context = _timed(pdf_qa.retrieve_relevant_chunks, probe["question"])
+            latencies.append(elapsed)
+    return latencies, len(latencies)
+
+
+@stage("pdf_reindex", unit="updates")
+def bench_pdf_reindex(work_dir: str, repeat: int):
+    """One-page edits of a large PDF: page-level update against a full rebuild"""
+    import statistics
+    import pdf_qa
+    from pdfminer.high_level import extract_text
+    from pdf_fixtures import make_corpus, write_pdf
+    pages, probes = make_corpus(REINDEX_PAGES)
+    path = os.path.join(work_dir, "reindex.pdf")
+    write_pdf(path, pages)
+
+    extracts, rebuilds = [], []
+    for _ in range(repeat):
+        extracts.append(_timed(extract_text, path)[0])
+        elapsed, ok = _timed(lambda: pdf_qa.build_vector_index(pdf_qa.extract_token_chunks(path)))
+        if not ok:
+            raise RuntimeError("build_vector_index failed")
+        rebuilds.append(elapsed)
+
+    pdf_qa.update_document(path)
+    latencies, embedded, found = [], 0, 0
+    for i in range(repeat):
+        # Change the fact on a different page each round
+        probe = probes[(i * 37 + 11) % len(probes)]
+        new_value = f"{900 + i}-R{i}"
+        pages[probe["page"]] = pages[probe["page"]].replace(probe["answer"], new_value)
+        probe["answer"] = new_value
+        write_pdf(path, pages)
+
+        elapsed, result = _timed(pdf_qa.update_document, path)
+        if (result["changed"], result["added"], result["removed"]) != (1, 0, 0):
+            raise RuntimeError(f"Expected one changed page, got {result}")
+        latencies.append(elapsed)
+        embedded += result["chunks_embedded"]
+        found += new_value in pdf_qa.retrieve_relevant_chunks(probe["question"])
+
+    full_ms = 1000 * statistics.median(rebuilds)
+    update_ms = 1000 * statistics.median(latencies)
+    extra = {
+        "full_rebuild_ms": full_ms,
+        "page_update_ms": update_ms,
+        "extract_ms": 1000 * statistics.median(extracts),
+        "speedup": full_ms / update_ms if update_ms else 0.0,
+        "chunks_reembedded": embedded / repeat,
+        "chunks_total": result["chunks"],
+        "edited_page_recall": found / repeat,
+    }
+    return latencies, len(latencies), extra
+
+
+@stage("chunking", unit="MB")
+def bench_chunking(work_dir: str, repeat: int):
+    """Token chunker throughput, with the legacy word chunker as a reference"""
+    import chunking
+    import pdf_qa
+    from pdfminer.high_level import extract_text
+    texts = [extract_text(path) for path in _pdf_paths(work_dir)]
+    size_mb = sum(len(t.encode("utf-8")) for t in texts) / (1024 * 1024)
+
+    latencies, legacy = [], []
+    for _ in range(repeat):
+        for text in texts:
+            elapsed, _chunks = _timed(chunking.chunk_text, text, pdf_qa.model.tokenizer,
+                                      pdf_qa.MAX_CHUNK_TOKENS, pdf_qa.CHUNK_OVERLAP_TOKENS)
+            latencies.append(elapsed)
+            elapsed, _chunks = _timed(pdf_qa._chunk_text, text, 1000, 200)
+            legacy.append(elapsed)
+
+    extra = {"legacy_throughput": size_mb * repeat / sum(legacy) if sum(legacy) else 0.0}
+    return latencies, size_mb * repeat, extra
+
+
+@stage("retrieval_quality", unit="queries")
+def bench_retrieval_quality(work_dir: str, repeat: int):
+    """Top-1 hit rate on the synthetic probes for token vs legacy word chunks"""
+    import pdf_qa
+    from pdfminer.high_level import extract_text
+    with open(os.path.join(work_dir, "probes.json")) as f:
+        probes = json.load(f)
+    path = _pdf_paths(work_dir)[0]
+
+    def hit_rate():
+        hits = sum(probe["answer"] in pdf_qa.retrieve_relevant_chunks(probe["question"]) for probe in probes)
+        return hits / len(probes) if probes else 0.0
+
+    legacy_chunks = pdf_qa._chunk_text(extract_text(path), 1000, 200)
+    window = pdf_qa.model.max_seq_length
+    token_counts = [len(ids) for ids in pdf_qa.model.tokenizer(legacy_chunks, add_special_tokens=True)["input_ids"]]
+    truncated = sum(max(0, n - window) for n in token_counts) / max(1, sum(token_counts))
+    pdf_qa.build_vector_index(legacy_chunks)
+    legacy_recall = hit_rate()
+
+    pdf_qa.build_vector_index(pdf_qa.extract_token_chunks(path))
+    latencies = []
+    for _ in range(repeat):
+        for probe in probes:
+            elapsed, _context = _timed(pdf_qa.retrieve_relevant_chunks, probe["question"])
+            latencies.append(elapsed)
+
+    extra = {
+        "token_chunk_recall": hit_rate(),
+        "legacy_chunk_recall": legacy_recall,
+        "legacy_truncated_fraction": truncated,
+    }
+    return latencies, len(latencies), extra
+
+
+@stage("mmr_select", unit="selections")
+def bench_mmr_select(work_dir: str, repeat: int):
+    """MMR re-ranking of 500 candidates down to 10 hits"""
+    import numpy as np
+    import pdf_qa
+    rng = np.random.default_rng(7)
+    dim = pdf_qa.model.get_sentence_embedding_dimension()
+    vectors = rng.standard_normal((500, dim)).astype("float32")
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    latencies = []
+    for i in range(repeat * 200):
+        elapsed, _order = _timed(pdf_qa.mmr_select, vectors[i % 500], vectors, 10)
+        latencies.append(elapsed)
+    return latencies, len(latencies)
+
+
+@stage("gemini_call", unit="calls")
+def bench_gemini_call(work_dir: str, repeat: int):
+    import pdf_qa
+    context = "Vector databases compare embeddings by distance. " * 40
+    latencies = []
+    for _ in range(repeat * 10):
+        pdf_qa.QUOTA_USED = 0
+        elapsed, response = _timed(pdf_qa.ask_gemini, "What do vector databases do?", context)
+        if "error" in response:
+            raise RuntimeError(response["error"])
+        latencies.append(elapsed)
+    return latencies, len(latencies)
+
+
+@stage("web_scrape", unit="pages")
+def bench_web_scrape(work_dir: str, repeat: int):
+    import web_qa
+    base_url = os.environ["GEMINI_API_BASE"]
+    pages = sorted(os.listdir(os.path.join(FIXTURES_DIR, "html")))
+    latencies = []
+    for _ in range(repeat * 5):
+        for page in pages:
+            elapsed, content = _timed(web_qa.scrape_website, f"{base_url}/pages/{page}")
+            if not content:
+                raise RuntimeError(f"Scrape of {page} returned no content")
+            latencies.append(elapsed)
+    return latencies, len(latencies)
+
+
+@stage("web_summarize", unit="queries")
+def bench_web_summarize(work_dir: str, repeat: int):
+    import pdf_qa
+    import web_qa
+    web_qa.SCRAPE_DELAY = 0
+    latencies = []
+    for _ in range(repeat * 3):
+        pdf_qa.QUOTA_USED = 0
+        web_qa.WEB_QUOTA_USED = 0
+        elapsed, summary = _timed(web_qa.web_search_and_summarize, "vector databases")
+        if summary.startswith("Error:"):
+            raise RuntimeError(summary)
+        latencies.append(elapsed)
+    return latencies, len(latencies)
+
+
+@stage("web_store", unit="lookups")
+def bench_web_store(work_dir: str, repeat: int):
+    """Local web store lookups, against answering the same query live"""
+    import pdf_qa
+    import web_qa
+    import web_store
+    web_qa.SCRAPE_DELAY = 0
+    base_url = os.environ["GEMINI_API_BASE"]
+    pages = sorted(os.listdir(os.path.join(FIXTURES_DIR, "html")))
+
+    add_latencies = []
+    for page in pages:
+        content = web_qa.scrape_website(f"{base_url}/pages/{page}")
+        elapsed, _count = _timed(web_store.add_page, f"{base_url}/pages/{page}", page, content, "benchmark")
+        add_latencies.append(elapsed)
+
+    queries = ["vector databases", "Gemini API quota", "appointment scheduling", "FAISS index types"]
+    latencies = []
+    for _ in range(repeat * 10):
+        for query in queries:
+            elapsed, _hits = _timed(web_store.lookup, query, min_score=0.0)
+            latencies.append(elapsed)
+
+    pdf_qa.QUOTA_USED = 0
+    web_qa.WEB_QUOTA_USED = 0
+    live, _ = _timed(web_qa.web_search_and_summarize, queries[0])
+    local, _ = _timed(web_qa.web_search_and_summarize, queries[0], prefer_local=True)
+    extra = {
+        "add_page_ms": 1000 * sum(add_latencies) / len(add_latencies),
+        "live_summarize_ms": live * 1000,
+        "local_summarize_ms": local * 1000,
+    }
+    return latencies, len(latencies), extra
+
+
+@stage("chatbot", unit="turns")
+def bench_chatbot(work_dir: str, repeat: int):
+    # BookingSystem writes bookings.db to the working directory
+    os.chdir(work_dir)
+    import assistant_functions as af
+    with open(os.path.join(FIXTURES_DIR, "conversations.json")) as f:
+        conversations = json.load(f)
+
+    # Warm up dateparser's language data so it does not dominate p99
+    af.EnhancedDateParser().parse_natural_date("tomorrow")
+
+    latencies = []
+    for _ in range(repeat * 5):
+        for turns in conversations:
+            bot = af.Chatbot()
+            done = False
+            for turn in turns:
+                elapsed, (_reply, done) = _timed(bot.handle_response, turn)
+                latencies.append(elapsed)
+            if not done:
+                raise RuntimeError(f"Conversation did not complete: {turns}")
+            bot.booking_system.db_conn.close()
+    return latencies, len(latencies)
+
+
+@stage("booking_reports", unit="reports")
+def bench_booking_reports(work_dir: str, repeat: int):
+    """Every report and export over a generated bookings database"""
+    import sqlite3
+    import booking_reports as br
+    from booking_fixtures import generate
+
+    db_path = os.path.join(work_dir, "bookings_large.db")
+    if not os.path.exists(db_path):
+        generate(db_path, BOOKING_ROWS)
+    conn = sqlite3.connect(db_path)
+    br.ensure_indexes(conn)
+
+    reports = {
+        "per_day": lambda: sum(1 for _ in br.counts_by_period(conn, "day")),
+        "per_week_created": lambda: sum(1 for _ in br.counts_by_period(conn, "week", by="created")),
+        "upcoming": lambda: sum(1 for _ in br.upcoming_load(conn, 30)),
+        "duplicates": lambda: sum(1 for _ in br.duplicate_contacts(conn)),
+        "export_csv": lambda: br.export_table(conn, "appointments", os.path.join(work_dir, "export.csv")),
+    }
+    latencies, extra = [], {}
+    for _ in range(repeat):
+        for name, report in reports.items():
+            elapsed, _rows = _timed(report)
+            latencies.append(elapsed)
+            extra[f"{name}_ms"] = min(extra.get(f"{name}_ms", float("inf")), elapsed * 1000)
+    conn.close()
+    return latencies, len(latencies), extra
+
+
+def run_worker(name: str, work_dir: str, repeat: int) -> dict:
+    func, unit = STAGES[name]
+    rss_before = _peak_rss_mb()
+    start = time.perf_counter()
+    outcome = func(work_dir, repeat)
+    latencies, items = outcome[0], outcome[1]
+    extra = outcome[2] if len(outcome) > 2 else {}
+    wall = time.perf_counter() - start
+    measured = sum(latencies)
+    latencies.sort()
+
+    def percentile(p):
+        index = min(len(latencies) - 1, max(0, int(round(p / 100.0 * len(latencies))) - 1))
+        return latencies[index] * 1000
+
+    return {
+        "unit": unit,
+        "samples": len(latencies),
+        "items": items,
+        "throughput": items / measured if measured else 0.0,
+        "p50_ms": percentile(50),
+        "p99_ms": percentile(99),
+        "wall_s": wall,
+        "rss_start_mb": rss_before,
+        "peak_rss_mb": _peak_rss_mb(),
+        "extra": extra,
+    }
+
+
+# ---------------------------------------------------------------------------
+# Driver side
+# ---------------------------------------------------------------------------
+
+def prepare_pdfs(work_dir: str, pages: list, extra: list):
+    """Write synthetic PDFs (plus any real ones supplied) and their probes"""
+    from pdf_fixtures import write_synthetic_pdf
+
+    paths, probes = [], []
+    for num_pages in pages:
+        path = os.path.join(work_dir, f"synthetic_{num_pages}p.pdf")
+        page_probes = write_synthetic_pdf(path, num_pages)
+        if not probes:
+            probes = page_probes
+        paths.append(path)
+
+    real = sorted(glob.glob(os.path.join(FIXTURES_DIR, "pdfs", "*.pdf"))) + list(extra)
+    paths.extend(os.path.abspath(p) for p in real)
+
+    with open(os.path.join(work_dir, "pdfs.json"), "w") as f:
+        json.dump(paths, f)
+    with open(os.path.join(work_dir, "probes.json"), "w") as f:
+        json.dump(probes, f)
+    return paths
+
+
+def run_stage_process(name: str, work_dir: str, repeat: int, env: dict) -> dict:
+    cmd = [sys.executable, os.path.abspath(__file__), "--worker", name,
+           "--work-dir", work_dir, "--repeat", str(repeat)]
+    proc = subprocess.run(cmd, env=env, cwd=REPO_ROOT, capture_output=True, text=True)
+    if proc.returncode != 0:
+        return {"error": (proc.stderr.strip().splitlines() or ["worker failed"])[-1]}
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def compare(results: dict, baseline: dict, tolerance: float, rss_tolerance: float) -> list:
+    """Return human-readable regressions against the stored baseline"""
+    regressions = []
+    for name, current in results.items():
+        base = baseline.get(name)
+        if not base or "error" in current or "error" in base:
+            continue
+        for key in ("p50_ms", "p99_ms"):
+            if current[key] > base[key] * (1 + tolerance):
+                regressions.append(f"{name}: {key} {current[key]:.2f} > baseline {base[key]:.2f}")
+        if current["throughput"] < base["throughput"] / (1 + tolerance):
+            regressions.append(f"{name}: throughput {current['throughput']:.1f} < baseline {base['throughput']:.1f}")
+        if current["peak_rss_mb"] > base["peak_rss_mb"] * (1 + rss_tolerance):
+            regressions.append(f"{name}: peak RSS {current['peak_rss_mb']:.1f}MB > baseline {base['peak_rss_mb']:.1f}MB")
+        for key, value in current.get("extra", {}).items():
+            base_value = base.get("extra", {}).get(key)
+            if key.endswith("_recall") and base_value is not None and value < base_value - RECALL_TOLERANCE:
+                regressions.append(f"{name}: {key} {value:.3f} < baseline {base_value:.3f}")
+    return regressions
+
+
+def print_table(results: dict):
+    print(f"\n{'stage':<20}{'throughput':>18}{'p50 ms':>10}{'p99 ms':>10}{'peak RSS MB':>13}")
+    print("-" * 71)
+    for name, r in results.items():
+        if "error" in r:
+            print(f"{name:<20} ERROR: {r['error']}")
+            continue
+        rate = f"{r['throughput']:.1f} {r['unit']}/s"
+        print(f"{name:<20}{rate:>18}{r['p50_ms']:>10.2f}{r['p99_ms']:>10.2f}{r['peak_rss_mb']:>13.1f}")
+        for key, value in r.get("extra", {}).items():
+            print(f"{'':<20}{key} = {value:.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmark suite")
+    parser.add_argument("--stages", nargs="+", choices=sorted(STAGES), help="Subset of stages to run")
+    parser.add_argument("--repeat", type=int, default=3, help="Repetitions per stage")
+    parser.add_argument("--pages", type=int, nargs="+", default=[10, 120], help="Synthetic PDF sizes in pages")
+    parser.add_argument("--pdf", action="append", default=[], help="Extra real PDF to include")
+    parser.add_argument("--latency-ms", type=float, default=0, help="Artificial stub server latency")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="Store this run as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed latency/throughput slowdown")
+    parser.add_argument("--rss-tolerance", type=float, default=0.15, help="Allowed peak RSS growth")
+    parser.add_argument("--output", help="Write full results as JSON")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    parser.add_argument("--work-dir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_worker(args.worker, args.work_dir, args.repeat)))
+        return 0
+
+    from stub_server import start_stub_server
+    server = start_stub_server(latency_ms=args.latency_ms)
+    env = dict(os.environ, HF_HUB_OFFLINE="1", TRANSFORMERS_OFFLINE="1", **server.env())
+
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="assistant-bench-") as work_dir:
+        env["WEB_STORE_DIR"] = os.path.join(work_dir, "web_store")
+        prepare_pdfs(work_dir, args.pages, args.pdf)
+        for name in args.stages or list(STAGES):
+            print(f"Running {name}...")
+            results[name] = run_stage_process(name, work_dir, args.repeat, env)
+    server.shutdown()
+
+    print_table(results)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    failed = [name for name, r in results.items() if "error" in r]
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nBaseline saved to {args.baseline}")
+        return 1 if failed else 0
+
+    if not os.path.exists(args.baseline):
+        print("\nNo baseline found; run with --save-baseline to record one.")
+        return 1 if failed else 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline, args.tolerance, args.rss_tolerance)
+    if regressions:
+        print("\n" + "!" * 71)
+        print("PERFORMANCE REGRESSION against baseline:")
+        for line in regressions:
+            print(f"  - {line}")
+        print("!" * 71)
+        return 1
+
+    print("\nNo regressions against baseline.")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
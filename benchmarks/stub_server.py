@@ -0,0 +1,116 @@
+"""Local HTTP server that replays recorded Gemini, Custom Search and web page responses"""
+import os
+import json
+import time
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+def _load(name: str) -> str:
+    with open(os.path.join(FIXTURES_DIR, name), encoding="utf-8") as f:
+        return f.read()
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Routes requests to the recorded fixture matching the real API"""
+
+    def _send(self, status: int, body: bytes, content_type: str):
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        path = urlparse(self.path).path
+        length = int(self.headers.get("Content-Length", 0))
+        self.rfile.read(length)
+        self.server.record(path, length)
+
+        if path.endswith(":generateContent"):
+            self._send(200, self.server.gemini_response, "application/json")
+        else:
+            self._send(404, b'{"error": "unknown endpoint"}', "application/json")
+
+    def do_GET(self):
+        parsed = urlparse(self.path)
+        self.server.record(parsed.path, 0)
+
+        if parsed.path == "/customsearch/v1":
+            num = int(parse_qs(parsed.query).get("num", ["10"])[0])
+            data = dict(self.server.search_response)
+            data["items"] = data["items"][:num]
+            self._send(200, json.dumps(data).encode("utf-8"), "application/json")
+        elif parsed.path.startswith("/pages/"):
+            page = self.server.pages.get(os.path.basename(parsed.path))
+            if page is None:
+                self._send(404, b"<html><body>Not found</body></html>", "text/html")
+            else:
+                self._send(200, page, "text/html; charset=utf-8")
+        else:
+            self._send(404, b"not found", "text/plain")
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, port: int = 0, latency_ms: float = 0):
+        super().__init__(("127.0.0.1", port), StubHandler)
+        self.base_url = f"http://127.0.0.1:{self.server_address[1]}"
+        self.latency = latency_ms / 1000.0
+        self.requests = {}
+        self._lock = threading.Lock()
+
+        self.gemini_response = _load("gemini_response.json").encode("utf-8")
+        self.search_response = json.loads(_load("custom_search_response.json").replace("{base_url}", self.base_url))
+        html_dir = os.path.join(FIXTURES_DIR, "html")
+        self.pages = {name: _load(os.path.join("html", name)).encode("utf-8")
+                      for name in sorted(os.listdir(html_dir)) if name.endswith(".html")}
+
+    def record(self, path: str, size: int):
+        with self._lock:
+            count, total = self.requests.get(path, (0, 0))
+            self.requests[path] = (count + 1, total + size)
+
+    def env(self) -> dict:
+        """Environment variables that point pdf_qa/web_qa at this server"""
+        return {
+            "GEMINI_API_BASE": self.base_url,
+            "GEMINI_API_KEY": "offline-benchmark",
+            "GOOGLE_SEARCH_URL": f"{self.base_url}/customsearch/v1",
+            "GOOGLE_API_KEY": "offline-benchmark",
+            "GOOGLE_CSE_ID": "offline-benchmark",
+        }
+
+
+def start_stub_server(port: int = 0, latency_ms: float = 0) -> StubServer:
+    """Start the stub server on a daemon thread"""
+    server = StubServer(port, latency_ms)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay recorded API responses locally")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=0, help="Artificial delay per response")
+    args = parser.parse_args()
+
+    server = StubServer(args.port, args.latency_ms)
+    print(f"Stub server listening on {server.base_url}")
+    print("Export these to point the assistant at it:")
+    for key, value in server.env().items():
+        print(f"  {key}={value}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nStopped")
@@ -0,0 +1,196 @@
+import csv
+import sqlite3
+from datetime import date, timedelta
+
+# Booking tables and the column holding each one's scheduled date
+TABLES = {
+    "call_requests": "call_date",
+    "appointments": "appointment_date",
+}
+
+# Weeks are labelled by their Monday, so a week spanning New Year stays one bucket
+PERIODS = {
+    "day": "{col}",
+    "week": "date({col}, '-6 days', 'weekday 1')",
+}
+
+# Digits-only phone and lower-case email, written identically in the
+# indexes and the queries so SQLite can use the expression indexes
+PHONE_KEY = "replace(replace(replace(replace(replace(replace(phone, ' ', ''), '-', ''), '+', ''), '(', ''), ')', ''), '.', '')"
+EMAIL_KEY = "lower(email)"
+
+DEFAULT_CHUNK_SIZE = 50000
+
+
+def index_definitions() -> dict:
+    """Index name -> indexed table and expression, for every report index"""
+    definitions = {}
+    for table, date_col in TABLES.items():
+        definitions[f"idx_{table}_{date_col}"] = (table, date_col)
+        definitions[f"idx_{table}_created"] = (table, "substr(timestamp, 1, 10)")
+        definitions[f"idx_{table}_phone_key"] = (table, PHONE_KEY)
+        definitions[f"idx_{table}_email_key"] = (table, EMAIL_KEY)
+    return definitions
+
+
+def index_statements() -> list:
+    """DDL for the indexes every report relies on"""
+    return [f"CREATE INDEX IF NOT EXISTS {name} ON {table}({expr})"
+            for name, (table, expr) in index_definitions().items()]
+
+
+def missing_indexes(conn: sqlite3.Connection) -> list:
+    """Names of report indexes not yet created (a cheap sqlite_master lookup)"""
+    existing = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    return [name for name in index_definitions() if name not in existing]
+
+
+def ensure_indexes(conn: sqlite3.Connection):
+    """Create report indexes if missing (no-op once they exist)"""
+    c = conn.cursor()
+    for statement in index_statements():
+        c.execute(statement)
+    conn.commit()
+
+
+def _stream(cursor: sqlite3.Cursor, chunk_size: int = DEFAULT_CHUNK_SIZE):
+    """Yield rows from a cursor in fetchmany batches"""
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            break
+        yield from rows
+
+
+def _date_expr(table: str, by: str) -> str:
+    if by == "created":
+        return "substr(timestamp, 1, 10)"
+    return TABLES[table]
+
+
+def _tables(table: str) -> list:
+    if table in (None, "all"):
+        return list(TABLES)
+    if table not in TABLES:
+        raise ValueError(f"Unknown table '{table}'. Choose from: {', '.join(TABLES)}")
+    return [table]
+
+
+def counts_by_period(conn: sqlite3.Connection, period: str = "day", table: str = "all",
+                     by: str = "scheduled", start: str = None, end: str = None):
+    """Yield (period, count) rows ordered by period.
+
+    `by` selects the scheduled date or the creation timestamp; `start` and
+    `end` are inclusive YYYY-MM-DD bounds on that same date.
+    """
+    if period not in PERIODS:
+        raise ValueError(f"Unknown period '{period}'. Choose from: {', '.join(PERIODS)}")
+
+    selects, params = [], []
+    for name in _tables(table):
+        col = _date_expr(name, by)
+        where, where_params = [], []
+        if start:
+            where.append(f"{col} >= ?")
+            where_params.append(start)
+        if end:
+            where.append(f"{col} <= ?")
+            where_params.append(end)
+        where_sql = f" WHERE {' AND '.join(where)}" if where else ""
+        # Aggregate per table first so each side is an index-only scan
+        selects.append(f"SELECT {PERIODS[period].format(col=col)} AS period, COUNT(*) AS n "
+                       f"FROM {name}{where_sql} GROUP BY period")
+        params += where_params
+
+    query = (f"SELECT period, SUM(n) FROM ({' UNION ALL '.join(selects)}) "
+             f"GROUP BY period ORDER BY period")
+    yield from _stream(conn.execute(query, params))
+
+
+def upcoming_load(conn: sqlite3.Connection, days: int = 14, today: date = None):
+    """Yield (date, calls, appointments, total) for the next `days` days"""
+    today = today or date.today()
+    start = today.isoformat()
+    end = (today + timedelta(days=days - 1)).isoformat()
+
+    query = """
+        SELECT day, SUM(calls), SUM(appointments), SUM(calls) + SUM(appointments)
+        FROM (
+            SELECT call_date AS day, COUNT(*) AS calls, 0 AS appointments
+            FROM call_requests WHERE call_date BETWEEN ? AND ? GROUP BY call_date
+            UNION ALL
+            SELECT appointment_date AS day, 0 AS calls, COUNT(*) AS appointments
+            FROM appointments WHERE appointment_date BETWEEN ? AND ? GROUP BY appointment_date
+        )
+        GROUP BY day ORDER BY day
+    """
+    yield from _stream(conn.execute(query, (start, end, start, end)))
+
+
+def duplicate_contacts(conn: sqlite3.Connection, min_count: int = 2):
+    """Yield (kind, contact, bookings) for phones/emails used at least `min_count` times
+
+    Phones are compared digits-only and emails case-insensitively, across
+    both call requests and appointments.
+    """
+    for kind, key in (("phone", PHONE_KEY), ("email", EMAIL_KEY)):
+        query = f"""
+            SELECT '{kind}', contact, SUM(n) AS total
+            FROM (
+                SELECT {key} AS contact, COUNT(*) AS n FROM call_requests GROUP BY contact
+                UNION ALL
+                SELECT {key} AS contact, COUNT(*) AS n FROM appointments GROUP BY contact
+            )
+            GROUP BY contact HAVING total >= ? ORDER BY total DESC, contact
+        """
+        yield from _stream(conn.execute(query, (min_count,)))
+
+
+def preview(conn: sqlite3.Connection, table: str, limit: int = 10):
+    """Return (columns, rows) for the first `limit` rows of a table"""
+    cursor = conn.execute(f"SELECT * FROM {_tables(table)[0]} LIMIT ?", (limit,))
+    return [d[0] for d in cursor.description], cursor.fetchall()
+
+
+def export_table(conn: sqlite3.Connection, table: str, path: str, fmt: str = "csv",
+                 chunk_size: int = DEFAULT_CHUNK_SIZE) -> int:
+    """Stream a whole table to CSV or Parquet; returns the number of rows written"""
+    cursor = conn.execute(f"SELECT * FROM {_tables(table)[0]} ORDER BY id")
+    columns = [d[0] for d in cursor.description]
+
+    if fmt == "csv":
+        written = 0
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(columns)
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                writer.writerows(rows)
+                written += len(rows)
+        return written
+
+    if fmt == "parquet":
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError("Parquet export requires pyarrow (pip install pyarrow)")
+
+        schema = pa.schema([(name, pa.int64() if name == "id" else pa.string()) for name in columns])
+        written = 0
+        with pq.ParquetWriter(path, schema) as writer:
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                batch = pa.RecordBatch.from_arrays(
+                    [pa.array(col, type=field.type) for col, field in zip(zip(*rows), schema)],
+                    schema=schema,
+                )
+                writer.write_batch(batch)
+                written += len(rows)
+        return written
+
+    raise ValueError(f"Unknown export format '{fmt}'. Choose 'csv' or 'parquet'")
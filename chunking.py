@@ -0,0 +1,124 @@
+import re
+
+# pdfminer separates pages with form feeds; paragraphs are blank-line separated
+PAGE_BREAK = '\f'
+PARAGRAPH_RE = re.compile(r'\n\s*\n')
+SENTENCE_RE = re.compile(r'(?<=[.!?])\s+')
+
+# At a paragraph boundary, close the chunk early once it is this full
+# rather than splitting the next paragraph across two chunks
+PARAGRAPH_BREAK_FILL = 0.6
+
+
+def split_units(text: str) -> list:
+    """Split extracted PDF text into (page, paragraph, sentence) units"""
+    return split_page_units(dict(enumerate(text.split(PAGE_BREAK))))
+
+
+def split_page_units(pages: dict) -> list:
+    """Split {page number: page text} into (page, paragraph, sentence) units"""
+    units = []
+    paragraph_no = 0
+    for page_no, page in sorted(pages.items()):
+        for paragraph in PARAGRAPH_RE.split(page):
+            paragraph = re.sub(r'\s+', ' ', paragraph).strip()
+            if not paragraph:
+                continue
+            for sentence in SENTENCE_RE.split(paragraph):
+                if sentence:
+                    units.append((page_no, paragraph_no, sentence))
+            paragraph_no += 1
+    return units
+
+
+def _split_long_unit(text: str, offsets: list, max_tokens: int) -> list:
+    """Cut a sentence that alone exceeds the window at token offsets"""
+    pieces = []
+    for start in range(0, len(offsets), max_tokens):
+        window = offsets[start:start + max_tokens]
+        pieces.append((text[window[0][0]:window[-1][1]], len(window)))
+    return pieces
+
+
+def chunk_units(units: list, tokenizer, max_tokens: int, overlap_tokens: int = 0) -> list:
+    """Pack units into chunks of at most `max_tokens` model tokens.
+
+    Every unit is tokenized once, in a single batch. Chunks never cross a
+    page; they prefer to end on a paragraph boundary; consecutive chunks on
+    the same page share up to `overlap_tokens` tokens of trailing sentences.
+    Returns dicts with the chunk `text`, its `page` and `tokens` count.
+    """
+    if not units:
+        return []
+
+    overlap_tokens = max(0, min(overlap_tokens, max_tokens // 2))
+    encoded = tokenizer([text for _, _, text in units],
+                        add_special_tokens=False, return_offsets_mapping=True)
+
+    # Flatten to (page, paragraph, text, tokens), splitting oversize sentences
+    pieces = []
+    for (page, paragraph, text), offsets in zip(units, encoded['offset_mapping']):
+        if len(offsets) <= max_tokens:
+            pieces.append((page, paragraph, text, len(offsets)))
+        else:
+            for piece, count in _split_long_unit(text, offsets, max_tokens):
+                pieces.append((page, paragraph, piece, count))
+
+    paragraph_tokens = {}
+    for _, paragraph, _, count in pieces:
+        paragraph_tokens[paragraph] = paragraph_tokens.get(paragraph, 0) + count
+
+    chunks = []
+    current = []       # pieces in the open chunk
+    current_tokens = 0
+
+    def flush():
+        chunks.append({
+            'text': ' '.join(piece[2] for piece in current),
+            'page': current[0][0],
+            'tokens': current_tokens,
+        })
+
+    for piece in pieces:
+        page, paragraph, _, count = piece
+        if current:
+            last_page, last_paragraph = current[-1][0], current[-1][1]
+            new_paragraph = paragraph != last_paragraph
+            overflow = current_tokens + count > max_tokens
+
+            if page != last_page or (new_paragraph and current_tokens >= max_tokens * PARAGRAPH_BREAK_FILL
+                                     and current_tokens + paragraph_tokens[paragraph] > max_tokens):
+                # Clean boundary: no overlap needed
+                flush()
+                current, current_tokens = [], 0
+            elif overflow:
+                flush()
+                # Carry trailing sentences forward, walking back only as far as the overlap
+                tail, tail_tokens = [], 0
+                for prev in reversed(current):
+                    if tail_tokens + prev[3] > overlap_tokens or tail_tokens + prev[3] + count > max_tokens:
+                        break
+                    tail.append(prev)
+                    tail_tokens += prev[3]
+                current, current_tokens = tail[::-1], tail_tokens
+
+        current.append(piece)
+        current_tokens += count
+
+    if current:
+        flush()
+    return chunks
+
+
+def chunk_text(text: str, tokenizer, max_tokens: int, overlap_tokens: int = 0) -> list:
+    """Split raw extracted text into token-sized chunks"""
+    return chunk_units(split_units(text), tokenizer, max_tokens, overlap_tokens)
+
+
+def chunk_pages(pages: dict, tokenizer, max_tokens: int, overlap_tokens: int = 0) -> list:
+    """Chunk a subset of a document's pages, given as {page number: page text}
+
+    Chunks never cross a page, so each page gets exactly the chunks it
+    would get when the whole document is chunked at once.
+    """
+    return chunk_units(split_page_units(pages), tokenizer, max_tokens, overlap_tokens)
@@ -1,18 +1,143 @@
 import sqlite3
-import pandas as pd
+import argparse
+import itertools
+import booking_reports as br
 
-conn = sqlite3.connect("bookings.db")
+TABLE_CHOICES = ["call_requests", "appointments", "all"]
 
-# ---- call_requests Table ----
-print("📞 Call Requests Table:\n")
-call_df = pd.read_sql_query("SELECT * FROM call_requests LIMIT 10;", conn)
-print("Columns:", list(call_df.columns))
-print(call_df.head(10))  # Show first 10 rows of data
 
-# ---- appointments Table ----
-print("\n📅 Appointments Table:\n")
-appt_df = pd.read_sql_query("SELECT * FROM appointments LIMIT 10;", conn)
-print("Columns:", list(appt_df.columns))
-print(appt_df.head(10))  # Show first 10 rows of data
+def print_rows(header: list, rows, limit: int = None, sample: int = 100):
+    """Print rows as aligned columns while streaming
 
-conn.close()
+    Column widths come from the first `sample` rows, so large results are
+    never held in memory.
+    """
+    rows = iter(rows)
+    head = list(itertools.islice(rows, sample if limit is None else min(sample, limit)))
+    widths = [len(str(h)) for h in header]
+    for row in head:
+        widths = [max(w, len(str(v))) for w, v in zip(widths, row)]
+
+    def fmt(values):
+        return "  ".join(str(v).ljust(w) for v, w in zip(values, widths)).rstrip()
+
+    print(fmt(header))
+    print("-" * (sum(widths) + 2 * (len(widths) - 1)))
+    shown = 0
+    for row in itertools.chain(head, rows):
+        if limit is not None and shown >= limit:
+            print(f"... (truncated at {limit} rows)")
+            break
+        print(fmt(row))
+        shown += 1
+    if shown == 0:
+        print("(no rows)")
+
+
+def cmd_preview(conn, args):
+    tables = [args.table] if args.table != "all" else ["call_requests", "appointments"]
+    for table in tables:
+        title = "📞 Call Requests Table" if table == "call_requests" else "📅 Appointments Table"
+        print(f"\n{title}:\n")
+        columns, rows = br.preview(conn, table, args.limit)
+        print("Columns:", columns)
+        print_rows(columns, rows)
+
+
+def warn_if_unindexed(conn, args):
+    missing = br.missing_indexes(conn)
+    if missing:
+        print(f"Note: {len(missing)} report indexes are missing, so this scans whole tables. "
+              f"Run 'python database_viewer.py --db {args.db} index' once to build them.\n")
+
+
+def cmd_counts(conn, args):
+    warn_if_unindexed(conn, args)
+    rows = br.counts_by_period(conn, args.command, args.table, args.by, args.start, args.end)
+    print_rows([args.command, "bookings"], rows, args.limit)
+
+
+def cmd_upcoming(conn, args):
+    warn_if_unindexed(conn, args)
+    print_rows(["date", "calls", "appointments", "total"], br.upcoming_load(conn, args.days))
+
+
+def cmd_duplicates(conn, args):
+    warn_if_unindexed(conn, args)
+    print_rows(["kind", "contact", "bookings"], br.duplicate_contacts(conn, args.min_count), args.limit)
+
+
+def cmd_index(conn, args):
+    missing = br.missing_indexes(conn)
+    if not missing:
+        print(f"Report indexes are already in place on {args.db}")
+        return
+    print(f"Building {len(missing)} report indexes on {args.db}...")
+    br.ensure_indexes(conn)
+    print("Done.")
+
+
+def cmd_export(conn, args):
+    written = br.export_table(conn, args.table, args.path, args.format, args.chunk_size)
+    print(f"Exported {written} rows from {args.table} to {args.path}")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Booking database reports and exports")
+    parser.add_argument("--db", default="bookings.db", help="SQLite database path")
+    sub = parser.add_subparsers(dest="command")
+
+    p = sub.add_parser("preview", help="Show the first rows of each table")
+    p.add_argument("--table", choices=TABLE_CHOICES, default="all")
+    p.add_argument("--limit", type=int, default=10)
+    p.set_defaults(func=cmd_preview)
+
+    for period in ("day", "week"):
+        p = sub.add_parser(period, help=f"Bookings per {period}")
+        p.add_argument("--table", choices=TABLE_CHOICES, default="all")
+        p.add_argument("--by", choices=["scheduled", "created"], default="scheduled",
+                       help="Group by booked date or by when the booking was made")
+        p.add_argument("--from", dest="start", help="First date (YYYY-MM-DD)")
+        p.add_argument("--to", dest="end", help="Last date (YYYY-MM-DD)")
+        p.add_argument("--limit", type=int, help="Maximum rows to print")
+        p.set_defaults(func=cmd_counts)
+
+    p = sub.add_parser("upcoming", help="Scheduled load per date from today")
+    p.add_argument("--days", type=int, default=14)
+    p.set_defaults(func=cmd_upcoming)
+
+    p = sub.add_parser("duplicates", help="Phones/emails used for more than one booking")
+    p.add_argument("--min-count", type=int, default=2)
+    p.add_argument("--limit", type=int, default=50)
+    p.set_defaults(func=cmd_duplicates)
+
+    p = sub.add_parser("index", help="Create the report indexes now (one-off, can take a while on large tables)")
+    p.set_defaults(func=cmd_index)
+
+    p = sub.add_parser("export", help="Stream a table to CSV or Parquet")
+    p.add_argument("table", choices=["call_requests", "appointments"])
+    p.add_argument("path")
+    p.add_argument("--format", choices=["csv", "parquet"], default="csv")
+    p.add_argument("--chunk-size", type=int, default=br.DEFAULT_CHUNK_SIZE)
+    p.set_defaults(func=cmd_export)
+
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if not args.command:
+        args = parser.parse_args(["--db", args.db, "preview"])
+
+    conn = sqlite3.connect(args.db)
+    try:
+        args.func(conn, args)
+    except (ValueError, RuntimeError, sqlite3.Error) as e:
+        print(f"Error: {str(e)}")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,12 @@
 # hybrid_qa.py (completely updated)
 import pdf_qa
 import web_qa
+import web_store
 import re
 import nltk
 from nltk import pos_tag, word_tokenize
 from nltk.chunk import ne_chunk
+import tracing
 
 # Download NLTK data
 try:
@@ -15,6 +17,7 @@ except LookupError:
     nltk.download('maxent_ne_chunker')
     nltk.download('words')
 
+@tracing.traced("hybrid.extract_entities")
 def extract_entities(question: str) -> list:
     """Extract key entities using NLP"""
     tokens = word_tokenize(question)
@@ -41,53 +44,223 @@ def extract_entities(question: str) -> list:
     
     return list(set(entities))
 
-def hybrid_qa(question: str) -> str:
-    """Answer questions by combining PDF content with web search"""
-    # First try to answer from PDF only
-    pdf_context = pdf_qa.retrieve_relevant_chunks(question)
-    pdf_response = pdf_qa.ask_gemini(
-        f"Answer this based ONLY on the context: {question}",
-        pdf_context
-    )
-    pdf_answer = pdf_qa.format_response(pdf_response)
+# PDF hits scoring below this cosine similarity don't count as coverage
+PDF_MIN_SCORE = 0.35
+# Largest evidence block sent in one consolidated request; beyond it, split calls
+MAX_PACKED_CHARS = 24000
+# Stored passages used per web lookup, and the cap when only raw pages are available
+WEB_PASSAGES = 3
+WEB_CHAR_CAP = 4000
+
+# Round-trip accounting for the consolidated planner
+last_plan = {}
+PLAN_TOTALS = {"questions": 0, "round_trips": 0, "split_round_trips": 0,
+               "web_searches": 0, "split_web_searches": 0}
+
+SECTION_RE = re.compile(r'^#{1,3}\s*(ANSWER|ENTITY:\s*(.+?))\s*$', re.MULTILINE | re.IGNORECASE)
+
+def _web_evidence(query: str, num_results: int = 1) -> tuple:
+    """Return (source label, text) for query from the web store or a live search"""
+    stored = web_store.lookup(query)
+    if stored:
+        print(f"📚 '{query}' not in PDF. Using stored web content...")
+        return "stored web", web_store.format_hits(stored)
     
-    # Check if answer is complete
-    if "not in the text" not in pdf_answer.lower() and "not mentioned" not in pdf_answer.lower():
-        return pdf_answer
+    print(f"🔍 '{query}' not in PDF. Searching web...")
+    sources = []
+    contents = web_qa.gather_web_sources(query, num_results, sources)
+    if not contents:
+        return "web", ""
     
-    # Extract key entities
-    entities = extract_entities(question)
-    if not entities:
-        print("🔍 Answer not found in PDF. Searching web...")
-        return web_qa.web_search_and_summarize(question)
+    # Pages just scraped into the store are cut down to their best passages;
+    # snippets and pages that could not be stored are sent as they are
+    stored_urls = [s['url'] for s in sources if s['stored']]
+    hits = web_store.search(query, k=WEB_PASSAGES, urls=stored_urls) if stored_urls else []
+    if not hits:
+        return "web", "\n\n".join(contents)[:WEB_CHAR_CAP]
+    text = web_store.format_hits(hits)
+    unstored = [s['content'] for s in sources if not s['stored']]
+    if unstored:
+        text += "\n\n" + "\n\n".join(unstored)[:WEB_CHAR_CAP]
+    return "web", text
+
+@tracing.traced("hybrid.gather_evidence")
+def gather_evidence(question: str) -> dict:
+    """Collect all PDF and web evidence for a question before any LLM call"""
+    pdf_hits = pdf_qa.search_chunks(question, k=3)
+    evidence = {
+        "question": question,
+        "pdf": "\n".join(hit['text'] for hit in pdf_hits),
+        "pdf_covered": bool(pdf_hits) and pdf_hits[0]['score'] >= PDF_MIN_SCORE,
+        "entities": [],
+        "web": None,
+    }
     
-    # Prepare hybrid context
-    hybrid_context = f"PDF CONTEXT:\n{pdf_context}\n\n"
-    missing_in_pdf = []
+    # The PDF answers it on its own; don't spend web quota on entities
+    if evidence["pdf_covered"]:
+        return evidence
     
     # Check PDF coverage for each entity
-    for entity in entities:
-        entity_context = pdf_qa.retrieve_relevant_chunks(entity, k=1)
-        if not entity_context or "not found" in entity_context.lower():
-            missing_in_pdf.append(entity)
-            print(f"🔍 Entity '{entity}' not in PDF. Searching web...")
-            web_info = web_qa.web_search_and_summarize(entity, num_results=1)
-            hybrid_context += f"WEB INFO ABOUT '{entity}':\n{web_info}\n\n"
+    for entity in extract_entities(question):
+        with tracing.span("hybrid.entity", entity=entity):
+            hits = pdf_qa.search_chunks(entity, k=1, mmr=False)
+            if hits and hits[0]['score'] >= PDF_MIN_SCORE:
+                evidence["entities"].append({"name": entity, "source": "PDF", "text": hits[0]['text']})
+            else:
+                source, text = _web_evidence(entity)
+                evidence["entities"].append({"name": entity, "source": source, "text": text})
+    
+    if not evidence["entities"]:
+        source, text = _web_evidence(question, num_results=3)
+        evidence["web"] = {"source": source, "text": text}
+    
+    return evidence
+
+def pack_request(evidence: dict) -> tuple:
+    """Build (instructions, context) for one structured Gemini call"""
+    names = [e["name"] for e in evidence["entities"]]
+    sections = [f"PDF CONTEXT:\n{evidence['pdf']}"]
+    for e in evidence["entities"]:
+        sections.append(f"EVIDENCE ABOUT '{e['name']}' (from {e['source']}):\n{e['text'] or 'Nothing found.'}")
+    if evidence["web"]:
+        sections.append(f"WEB EVIDENCE (from {evidence['web']['source']}):\n{evidence['web']['text'] or 'Nothing found.'}")
+    
+    instructions = (
+        f"Comprehensively answer this question: {evidence['question']}\n\n"
+        f"Use all available information in the context. "
+        f"Highlight key points and differences where applicable. "
+        f"Clearly indicate which information comes from the PDF and which comes from web sources, "
+        f"citing URLs for web information.\n\n"
+        f"Format your reply exactly as:\n## ANSWER\n<the answer>\n"
+    )
+    if names:
+        instructions += (
+            f"followed by one section per entity, each headed '## ENTITY: <name>', "
+            f"summarizing what the evidence says about it. Entities: {', '.join(names)}\n"
+        )
+    return instructions, "\n\n".join(sections)
+
+def parse_sections(text: str) -> dict:
+    """Split a structured reply into its answer and per-entity sections"""
+    matches = list(SECTION_RE.finditer(text))
+    if not matches:
+        return {"answer": text.strip(), "entities": {}}
+    
+    parsed = {"answer": "", "entities": {}}
+    for i, match in enumerate(matches):
+        body_end = matches[i + 1].start() if i + 1 < len(matches) else len(text)
+        body = text[match.end():body_end].strip()
+        if match.group(2):
+            parsed["entities"][match.group(2).strip()] = body
+        else:
+            parsed["answer"] = body
+    if not parsed["answer"]:
+        parsed["answer"] = text[:matches[0].start()].strip()
+    return parsed
+
+def _render(parsed: dict) -> str:
+    answer = parsed["answer"]
+    if parsed["entities"]:
+        details = "\n".join(f"- {name}: {body}" for name, body in parsed["entities"].items())
+        answer += f"\n\nDetails:\n{details}"
+    return answer
+
+def _answer_with_split_calls(evidence: dict) -> str:
+    """Fallback when evidence is too large for one request: summarize web evidence separately"""
+    hybrid_context = f"PDF CONTEXT:\n{evidence['pdf']}\n\n"
+    for e in evidence["entities"]:
+        if e["source"] == "PDF":
+            hybrid_context += f"PDF INFO ABOUT '{e['name']}':\n{e['text']}\n\n"
         else:
-            hybrid_context += f"PDF INFO ABOUT '{entity}':\n{entity_context}\n\n"
+            summary = web_qa.summarize_sources(e["name"], [e["text"]]) if e["text"] else "Nothing found."
+            hybrid_context += f"WEB INFO ABOUT '{e['name']}':\n{summary}\n\n"
+    if evidence["web"] and evidence["web"]["text"]:
+        summary = web_qa.summarize_sources(evidence["question"], [evidence["web"]["text"]])
+        hybrid_context += f"WEB INFO:\n{summary}\n\n"
     
     # Ask for comprehensive answer
     prompt = (
-        f"Comprehensively answer this question: {question}\n\n"
+        f"Comprehensively answer this question: {evidence['question']}\n\n"
         f"Use all available information below. "
         f"Highlight key points and differences where applicable. "
         f"Clearly indicate which information comes from the PDF and which comes from web sources.\n\n"
         f"{hybrid_context}"
     )
-    
     hybrid_response = pdf_qa.ask_gemini(prompt)
     return pdf_qa.format_response(hybrid_response)
 
+def _split_costs(evidence: dict) -> tuple:
+    """(Gemini calls, Custom Search calls) the per-entity flow would have made for the same evidence"""
+    if evidence["pdf_covered"]:
+        return 1, 0  # Answered by the PDF-only call
+    if not evidence["entities"]:
+        return 2, 1  # PDF-only attempt, then one web search and summary
+    # PDF-only attempt, one live search and summary per web lookup, final synthesis
+    web_calls = sum(1 for e in evidence["entities"] if e["source"] != "PDF")
+    return 2 + web_calls, web_calls
+
+@tracing.traced("hybrid.qa")
+def hybrid_qa(question: str) -> str:
+    """Answer questions by combining PDF content with web search
+    
+    All evidence is gathered first and sent in a single structured Gemini
+    request; separate summary calls are only made when the packed context
+    exceeds MAX_PACKED_CHARS.
+    """
+    global last_plan
+    quota_before = pdf_qa.QUOTA_USED
+    web_quota_before = web_qa.WEB_QUOTA_USED
+    evidence = gather_evidence(question)
+    instructions, context = pack_request(evidence)
+    
+    if len(instructions) + len(context) <= MAX_PACKED_CHARS:
+        mode = "consolidated"
+        response = pdf_qa.ask_gemini(
+            instructions, context,
+            max_context_length=MAX_PACKED_CHARS,
+            max_output_tokens=min(2048, 500 + 200 * len(evidence["entities"])),
+        )
+        answer = _render(parse_sections(pdf_qa.format_response(response)))
+    else:
+        mode = "split"
+        print(f"Evidence too large for one request ({len(context)} chars). Using separate calls...")
+        answer = _answer_with_split_calls(evidence)
+    
+    round_trips = pdf_qa.QUOTA_USED - quota_before
+    web_searches = web_qa.WEB_QUOTA_USED - web_quota_before
+    split_round_trips, split_web_searches = _split_costs(evidence)
+    last_plan = {
+        "mode": mode,
+        "entities": len(evidence["entities"]),
+        "round_trips": round_trips,
+        "split_round_trips": split_round_trips,
+        "saved": max(0, split_round_trips - round_trips),
+        "web_searches": web_searches,
+        "split_web_searches": split_web_searches,
+    }
+    PLAN_TOTALS["questions"] += 1
+    PLAN_TOTALS["round_trips"] += round_trips
+    PLAN_TOTALS["split_round_trips"] += split_round_trips
+    PLAN_TOTALS["web_searches"] += web_searches
+    PLAN_TOTALS["split_web_searches"] += split_web_searches
+    tracing.incr("gemini_round_trips", round_trips, mode=mode)
+    tracing.incr("gemini_round_trips_saved", last_plan["saved"])
+    return answer
+
+def last_plan_report() -> str:
+    """Round trips and quota saved by the planner for the last question and overall"""
+    if not last_plan:
+        return ""
+    saved_total = PLAN_TOTALS["split_round_trips"] - PLAN_TOTALS["round_trips"]
+    searches_saved = PLAN_TOTALS["split_web_searches"] - PLAN_TOTALS["web_searches"]
+    return (f"Gemini round trips: {last_plan['round_trips']} ({last_plan['mode']}, "
+            f"{last_plan['saved']} saved vs per-entity calls) | "
+            f"Custom Search calls: {last_plan['web_searches']} "
+            f"(per-entity flow: {last_plan['split_web_searches']}) | "
+            f"Session: {PLAN_TOTALS['round_trips']} Gemini and {PLAN_TOTALS['web_searches']} search calls used, "
+            f"saved vs per-entity flow: {saved_total} Gemini, {searches_saved} search "
+            f"(negative means extra calls)")
+
 def get_quota_status():
     """Get combined quota status"""
     pdf_quota = f"PDF Quota: {pdf_qa.QUOTA_USED}/{pdf_qa.MAX_QUOTA}"
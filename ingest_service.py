@@ -0,0 +1,418 @@
+import os
+import json
+import time
+import queue
+import hashlib
+import argparse
+import itertools
+import threading
+import numpy as np
+from dotenv import load_dotenv
+import pdf_qa
+import tracing
+
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+except ImportError:  # Fall back to polling
+    Observer = None
+    FileSystemEventHandler = object
+
+# Load environment
+load_dotenv()
+INGEST_STATE_DIR = os.getenv("INGEST_STATE_DIR", "ingest_state")
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "2"))
+POLL_INTERVAL = float(os.getenv("INGEST_POLL_INTERVAL", "5"))
+SETTLE_SECONDS = 2.0  # Let files that are still being copied settle first
+
+URGENT = 0   # A user is waiting on this document
+NORMAL = 10  # Found by the directory watcher
+
+
+def _doc_id(path: str) -> str:
+    return hashlib.sha1(path.encode("utf-8")).hexdigest()[:16]
+
+
+def _atomic_write(path: str, write):
+    """Write via a temp file and rename, so readers never see a partial file"""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        write(f)
+    os.replace(tmp_path, path)
+
+
+class _WatchHandler(FileSystemEventHandler):
+    """Forward filesystem events for PDFs to the service"""
+
+    def __init__(self, service):
+        self.service = service
+
+    def _is_pdf(self, path):
+        return path.lower().endswith(".pdf")
+
+    def on_created(self, event):
+        if not event.is_directory and self._is_pdf(event.src_path):
+            self.service.submit(event.src_path)
+
+    def on_modified(self, event):
+        self.on_created(event)
+
+    def on_moved(self, event):
+        if not event.is_directory:
+            if self._is_pdf(event.src_path):
+                self.service.remove(event.src_path)
+            if self._is_pdf(event.dest_path):
+                self.service.submit(event.dest_path)
+
+    def on_deleted(self, event):
+        if not event.is_directory and self._is_pdf(event.src_path):
+            self.service.remove(event.src_path)
+
+
+class IngestionService:
+    """Background PDF ingestion with a priority job queue and directory watching
+
+    Worker threads extract, chunk and embed documents while queries keep
+    using the current index. Each document is patched into the live index
+    with pdf_qa.update_document, so a revised file only re-embeds the pages
+    that changed. Per-document chunks, embeddings and page hashes, plus a
+    manifest of progress, are kept in `state_dir`, so a restart resumes
+    where it stopped and serves already ingested documents immediately.
+    """
+
+    def __init__(self, watch_dir: str = None, state_dir: str = INGEST_STATE_DIR,
+                 workers: int = INGEST_WORKERS, poll_interval: float = POLL_INTERVAL,
+                 use_watchdog: bool = True):
+        self.watch_dir = os.path.abspath(watch_dir) if watch_dir else None
+        self.state_dir = state_dir
+        self.docs_dir = os.path.join(state_dir, "docs")
+        self.manifest_path = os.path.join(state_dir, "manifest.json")
+        self.num_workers = max(1, workers)
+        self.poll_interval = poll_interval
+        self.use_watchdog = use_watchdog and Observer is not None
+
+        self.manifest = {}   # path -> progress entry
+        self._queue = queue.PriorityQueue()
+        self._pending = {}   # path -> best queued priority
+        self._active = {}    # path -> jobs running or waiting on its lock
+        self._path_locks = {}  # path -> lock, so one file never runs on two workers
+        self._seq = itertools.count()
+        self._lock = threading.RLock()
+        self._changed = threading.Condition(self._lock)
+        self._stop = threading.Event()
+        self._threads = []
+        self._observer = None
+
+    # ------------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------------
+
+    def start(self):
+        """Load saved progress, publish it, and start workers and the watcher"""
+        os.makedirs(self.docs_dir, exist_ok=True)
+        self._load_state()
+
+        # Resume anything that was queued or running when we last stopped
+        for path, entry in list(self.manifest.items()):
+            if entry["status"] in ("queued", "running"):
+                self.submit(path, entry.get("priority", NORMAL))
+
+        for i in range(self.num_workers):
+            thread = threading.Thread(target=self._worker, name=f"ingest-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+        if self.watch_dir:
+            self.scan()
+            if self.use_watchdog:
+                self._observer = Observer()
+                self._observer.schedule(_WatchHandler(self), self.watch_dir, recursive=True)
+                self._observer.start()
+            else:
+                thread = threading.Thread(target=self._poll, name="ingest-poll", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+        return self
+
+    def stop(self):
+        """Stop watching and let workers finish their current document
+
+        Queued documents are not ingested now; they are resumed on the next start.
+        """
+        self._stop.set()
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join()
+        for _ in range(self.num_workers):
+            self._queue.put((float("inf"), next(self._seq), None))
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    # ------------------------------------------------------------------
+    # Jobs
+    # ------------------------------------------------------------------
+
+    def submit(self, path: str, priority: int = NORMAL):
+        """Queue a PDF; a more urgent submission overtakes an earlier one"""
+        path = os.path.abspath(path)
+        with self._lock:
+            if path in self._pending and self._pending[path] <= priority:
+                return
+            self._pending[path] = priority
+            entry = self.manifest.setdefault(path, {"doc_id": _doc_id(path)})
+            entry.update(status="queued", priority=priority)
+            self._save_manifest()
+        self._queue.put((priority, next(self._seq), path))
+        tracing.incr("ingest_jobs", priority="urgent" if priority == URGENT else "normal")
+
+    def wait_for(self, path: str, timeout: float = None) -> bool:
+        """Block until a document is ingested and searchable; True on success"""
+        path = os.path.abspath(path)
+        deadline = None if timeout is None else time.time() + timeout
+        with self._changed:
+            while path in self._pending or path in self._active:
+                remaining = None if deadline is None else deadline - time.time()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._changed.wait(remaining)
+            return self.manifest.get(path, {}).get("status") == "done"
+
+    def ingest_now(self, path: str, timeout: float = None) -> bool:
+        """Ingest ahead of the background backlog and wait for the result"""
+        entry = self.manifest.get(os.path.abspath(path), {})
+        if entry.get("status") == "done" and not self.needs_ingest(path):
+            return True
+        self.submit(path, URGENT)
+        return self.wait_for(path, timeout)
+
+    def remove(self, path: str):
+        """Drop a deleted document from the index and the saved state"""
+        path = os.path.abspath(path)
+        with self._lock:
+            entry = self.manifest.pop(path, None)
+            self._pending.pop(path, None)
+            if entry:
+                pdf_qa.remove_document(path)
+                self._delete_doc_files(entry["doc_id"])
+                self._save_manifest()
+
+    def needs_ingest(self, path: str) -> bool:
+        """True for new files, changed files and unfinished jobs
+
+        A failed document is not retried until its file changes.
+        """
+        path = os.path.abspath(path)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return False
+        entry = self.manifest.get(path)
+        if not entry or entry.get("status") in ("queued", "running"):
+            return True
+        return entry.get("mtime") != stat.st_mtime or entry.get("size") != stat.st_size
+
+    def scan(self):
+        """Queue new or changed PDFs under the watch directory and drop deleted ones"""
+        if not self.watch_dir:
+            return
+        seen = set()
+        for root, _, files in os.walk(self.watch_dir):
+            for name in files:
+                if name.lower().endswith(".pdf"):
+                    path = os.path.join(root, name)
+                    seen.add(path)
+                    with self._lock:
+                        if path not in self._pending and path not in self._active and self.needs_ingest(path):
+                            self.submit(path)
+
+        prefix = self.watch_dir + os.sep
+        with self._lock:
+            removed = [p for p in self.manifest if p.startswith(prefix) and p not in seen]
+        for path in removed:
+            self.remove(path)
+
+    def status(self) -> dict:
+        """Counts of documents by state, plus indexed chunks"""
+        with self._lock:
+            counts = {"queued": 0, "running": 0, "done": 0, "failed": 0}
+            for entry in self.manifest.values():
+                counts[entry["status"]] = counts.get(entry["status"], 0) + 1
+            counts["chunks"] = sum(entry.get("chunks", 0) for entry in self.manifest.values())
+            return counts
+
+    def chunk_count(self, path: str) -> int:
+        with self._lock:
+            return self.manifest.get(os.path.abspath(path), {}).get("chunks", 0)
+
+    # ------------------------------------------------------------------
+    # Workers
+    # ------------------------------------------------------------------
+
+    def _poll(self):
+        while not self._stop.wait(self.poll_interval):
+            try:
+                self.scan()
+            except Exception as e:
+                print(f"Ingestion scan error: {str(e)}")
+
+    def _worker(self):
+        while True:
+            priority, _, path = self._queue.get()
+            if path is None or self._stop.is_set():
+                # Leave the rest of the backlog; it stays "queued" in the
+                # manifest, so the next start resumes it
+                break
+
+            with self._lock:
+                # Skip stale copies overtaken by a more urgent submission
+                if self._pending.get(path) != priority:
+                    continue
+                del self._pending[path]
+                self._active[path] = self._active.get(path, 0) + 1
+                self.manifest[path].update(status="running")
+                self._save_manifest()
+
+            try:
+                with tracing.span("ingest.document", path=path, priority=priority):
+                    self._ingest(path, priority)
+            except Exception as e:
+                print(f"Ingestion error for {path}: {str(e)}")
+                with self._lock:
+                    if path in self.manifest:
+                        self.manifest[path].update(status="failed", error=str(e))
+                        self._save_manifest()
+            finally:
+                with self._changed:
+                    self._active[path] -= 1
+                    if not self._active[path]:
+                        del self._active[path]
+                    self._changed.notify_all()
+
+    def _ingest(self, path: str, priority: int):
+        with self._lock:
+            path_lock = self._path_locks.setdefault(path, threading.Lock())
+        with path_lock:
+            stat = os.stat(path)
+            settle = SETTLE_SECONDS - (time.time() - stat.st_mtime)
+            if settle > 0 and priority != URGENT:
+                time.sleep(settle)
+                stat = os.stat(path)
+            with self._lock:
+                # Remember the version tried, so a failure is only retried once the file changes
+                if path in self.manifest:
+                    self.manifest[path].update(mtime=stat.st_mtime, size=stat.st_size)
+
+            # Patches the live index; only pages that changed are re-embedded
+            result = pdf_qa.update_document(path)
+            if result is None:
+                raise ValueError("the PDF could not be read")
+            with self._lock:
+                if path in self.manifest:
+                    self.manifest[path]["chunks"] = result["chunks"]
+            if not result["chunks"]:
+                raise ValueError("no text could be extracted")
+
+            after = os.stat(path)
+            if (after.st_mtime, after.st_size) != (stat.st_mtime, stat.st_size):
+                # File changed while we read it; go round again
+                with self._lock:
+                    self._pending.pop(path, None)
+                self.submit(path, priority)
+                return
+
+            doc_id = _doc_id(path)
+            self._write_doc_files(doc_id, *pdf_qa.document_chunks(path))
+            with self._lock:
+                if path not in self.manifest:  # Deleted while we were working
+                    pdf_qa.remove_document(path)
+                    self._delete_doc_files(doc_id)
+                    return
+                self.manifest[path].update(status="done", mtime=stat.st_mtime, size=stat.st_size,
+                                           chunks=result["chunks"], ingested_at=time.time(), error=None)
+                self._save_manifest()
+        tracing.incr("ingest_chunks", result["chunks_embedded"])
+
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
+
+    def _doc_paths(self, doc_id: str) -> tuple:
+        base = os.path.join(self.docs_dir, doc_id)
+        return base + ".json", base + ".npy"
+
+    def _write_doc_files(self, doc_id: str, chunk_dicts: list, embeddings: np.ndarray, hashes: list):
+        chunks_path, vectors_path = self._doc_paths(doc_id)
+        data = json.dumps({"pages": hashes, "chunks": chunk_dicts}).encode("utf-8")
+        _atomic_write(vectors_path, lambda f: np.save(f, embeddings))
+        _atomic_write(chunks_path, lambda f: f.write(data))
+
+    def _delete_doc_files(self, doc_id: str):
+        for path in self._doc_paths(doc_id):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def _save_manifest(self):
+        data = json.dumps(self.manifest, indent=1).encode("utf-8")
+        _atomic_write(self.manifest_path, lambda f: f.write(data))
+
+    def _load_state(self):
+        if os.path.exists(self.manifest_path):
+            try:
+                with open(self.manifest_path, encoding="utf-8") as f:
+                    self.manifest = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"Ingestion manifest unreadable, starting fresh: {str(e)}")
+                self.manifest = {}
+
+        # Publish every saved document as one index, keeping page hashes
+        # so later changes are patched in page by page
+        all_chunks, all_embeddings, hashes = [], [], {}
+        for path, entry in self.manifest.items():
+            if entry["status"] != "done":
+                continue
+            chunks_path, vectors_path = self._doc_paths(entry["doc_id"])
+            try:
+                with open(chunks_path, encoding="utf-8") as f:
+                    saved = json.load(f)
+                doc_chunks, doc_hashes = saved["chunks"], saved["pages"]
+                embeddings = np.load(vectors_path)
+            except (OSError, ValueError, KeyError, TypeError):
+                entry.update(status="queued", chunks=0)  # Saved files lost or outdated; ingest again
+                continue
+            all_chunks.extend(dict(chunk, source=path) for chunk in doc_chunks)
+            all_embeddings.append(embeddings)
+            hashes[path] = doc_hashes
+
+        dim = pdf_qa.model.get_sentence_embedding_dimension()
+        with tracing.span("ingest.load", documents=len(hashes), chunks=len(all_chunks)):
+            pdf_qa.install_index(all_chunks, np.vstack(all_embeddings) if all_embeddings
+                                 else np.zeros((0, dim), dtype="float32"), hashes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingest a directory of PDFs in the background")
+    parser.add_argument("directory", help="Directory (or share) to watch for PDFs")
+    parser.add_argument("--state-dir", default=INGEST_STATE_DIR)
+    parser.add_argument("--workers", type=int, default=INGEST_WORKERS)
+    parser.add_argument("--poll", action="store_true", help="Poll instead of using filesystem events")
+    parser.add_argument("--poll-interval", type=float, default=POLL_INTERVAL)
+    args = parser.parse_args()
+
+    service = IngestionService(args.directory, args.state_dir, args.workers,
+                               args.poll_interval, use_watchdog=not args.poll)
+    service.start()
+    print(f"Watching {service.watch_dir} (Ctrl+C to stop)")
+    try:
+        while True:
+            s = service.status()
+            print(f"queued {s['queued']} | running {s['running']} | done {s['done']} | "
+                  f"failed {s['failed']} | {s['chunks']} chunks indexed")
+            time.sleep(5)
+    except KeyboardInterrupt:
+        print("\nStopping...")
+        service.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -3,6 +3,8 @@ import assistant_functions as af
 import pdf_qa
 import web_qa
 import hybrid_qa 
+import ingest_service
+import tracing
 import os
 import re
 
@@ -48,19 +50,42 @@ def handle_booking_flow():
 
 # Global state for PDF loading
 pdf_loaded = False
+# Background ingestion service, started when INGEST_WATCH_DIR is set
+ingestion = None
+
+def load_pdf_with_ingestion(pdf_path: str) -> bool:
+    """Ingest a PDF ahead of the background queue and wait for it"""
+    print("Processing PDF (ahead of background ingestion)...")
+    if not ingestion.ingest_now(pdf_path):
+        print("Failed to extract text from PDF. Returning to main menu.")
+        return False
+    print(f"PDF processed. {ingestion.chunk_count(pdf_path)} chunks indexed "
+          f"({ingestion.status()['chunks']} across all ingested documents).")
+    return True
+
 def handle_pdf_flow():
     """Handles the PDF Q&A functionality with hybrid capabilities"""
     global pdf_loaded
     
     # Load PDF if not already loaded
     if pdf_loaded == False:
-        pdf_path = input("\nPlease provide the path to the PDF file: ").strip()
-        if not os.path.exists(pdf_path):
+        prompt = "\nPlease provide the path to the PDF file: "
+        if ingestion and ingestion.status()["chunks"]:
+            prompt = "\nPlease provide the path to the PDF file (or press Enter to use ingested documents): "
+        pdf_path = input(prompt).strip()
+        if not pdf_path and ingestion and ingestion.status()["chunks"]:
+            pdf_loaded = True
+        elif not os.path.exists(pdf_path):
             print("Error: File not found. Returning to main menu.")
             return
-            
+        elif ingestion:
+            if not load_pdf_with_ingestion(pdf_path):
+                return
+            pdf_loaded = True
+    
+    if pdf_loaded == False:
         print("Processing PDF...")
-        chunks = pdf_qa.extract_text_chunks(pdf_path)
+        chunks = pdf_qa.extract_token_chunks(pdf_path)
         if not chunks:
             print("Failed to extract text from PDF. Returning to main menu.")
             return
@@ -70,6 +95,8 @@ def handle_pdf_flow():
             print(f"PDF processed. {len(chunks)} chunks indexed.")
         else:
             print("Failed to build index. Using simple text matching.")
+    else:
+        tracing.incr("cache_hits", cache="pdf_index")
     
     # Q&A loop
     print("\nAsk questions about the PDF (type 'back' to return to main menu)")
@@ -84,9 +111,19 @@ def handle_pdf_flow():
         answer = hybrid_qa.hybrid_qa(question)
         print(f"\nAnswer: {answer}")
         print(hybrid_qa.get_quota_status())
+        print(hybrid_qa.last_plan_report())
         
 def main():
     """Main routing function"""
+    global ingestion
+    tracing.start_metrics_server()
+    
+    watch_dir = os.getenv("INGEST_WATCH_DIR")
+    if watch_dir:
+        ingestion = ingest_service.IngestionService(watch_dir).start()
+        status = ingestion.status()
+        print(f"Background ingestion watching {watch_dir}: "
+              f"{status['done']} documents ready, {status['queued']} queued")
     print("\n" + "=" * 60)
     print("🤖 Enhanced Assistant System")
     print("You can request assistance with:")
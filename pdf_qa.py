@@ -1,12 +1,24 @@
 import os
 import re
+import io
+import hashlib
+import difflib
 import requests
 import numpy as np
 import faiss
 from dotenv import load_dotenv
 from sentence_transformers import SentenceTransformer
 from pdfminer.high_level import extract_text  # Lightweight PDF extraction
+from pdfminer.pdfpage import PDFPage
+from pdfminer.pdfinterp import PDFResourceManager, PDFPageInterpreter
+from pdfminer.converter import TextConverter
+from pdfminer.layout import LAParams
+from pdfminer.pdftypes import resolve1, PDFObjRef, PDFStream
+from pdfminer.psparser import LIT
 import logging
+import threading
+import tracing
+import chunking
 
 # Suppress PDFMiner warnings
 logging.getLogger('pdfminer').setLevel(logging.ERROR)
@@ -14,22 +26,130 @@ logging.getLogger('pdfminer').setLevel(logging.ERROR)
 # Load environment
 load_dotenv()
 API_KEY = os.getenv("GEMINI_API_KEY")
+GEMINI_API_BASE = os.getenv("GEMINI_API_BASE", "https://generativelanguage.googleapis.com")
 QUOTA_USED = 0
 MAX_QUOTA = 500  # Free tier daily limit
 
 # Initialize embedding model
 model = SentenceTransformer('all-MiniLM-L6-v2')
-vector_index = None
-chunks = []
+vector_index = None  # faiss.IndexIDMap2 over inner product, keyed by chunk id
+chunks = {}          # Chunk id -> text
+chunk_meta = {}      # Chunk id -> {'page', 'tokens', 'source'} when built from token chunks
+page_chunks = {}     # (source, page) -> chunk ids in reading order
+document_hashes = {} # Source -> page_hashes() of the indexed version
+_next_id = 0
+_index_lock = threading.Lock()  # Held while reading or changing any of the above
 
-def extract_text_chunks(pdf_path: str, chunk_size: int = 1000, overlap: int = 200) -> list:
-    """Extract text and split into semantic chunks"""
+# Chunks must fit the encoder window, which reserves [CLS] and [SEP]
+MAX_CHUNK_TOKENS = model.max_seq_length - 2
+CHUNK_OVERLAP_TOKENS = 48
+
+def _extract_text(pdf_path: str) -> str:
+    """Extract raw text, pages separated by form feeds; None on failure"""
     try:
-        text = extract_text(pdf_path)
+        with tracing.span("pdf.extract", path=pdf_path) as sp:
+            text = extract_text(pdf_path)
+            sp.set(chars=len(text))
+        return text
     except Exception as e:
         print(f"PDF extraction error: {str(e)}")
+        return None
+
+def _object_digest(obj, memo: dict) -> bytes:
+    """Digest of a PDF object and everything it references
+    
+    Referenced objects are hashed once per document (memo, keyed by object
+    id), so fonts and forms shared by many pages cost nothing extra.
+    Image data is skipped since it never contributes text.
+    """
+    if isinstance(obj, PDFObjRef):
+        if obj.objid not in memo:
+            memo[obj.objid] = b''  # Breaks reference cycles
+            memo[obj.objid] = _object_digest(obj.resolve(), memo)
+        return memo[obj.objid]
+    
+    digest = hashlib.sha1()
+    if isinstance(obj, PDFStream):
+        digest.update(_object_digest(obj.attrs, memo))
+        if obj.get('Subtype') is not LIT('Image'):
+            digest.update(obj.get_data())
+    elif isinstance(obj, dict):
+        for key in sorted(obj):
+            digest.update(key.encode('utf-8'))
+            digest.update(_object_digest(obj[key], memo))
+    elif isinstance(obj, list):
+        for item in obj:
+            digest.update(_object_digest(item, memo))
+    else:
+        digest.update(repr(obj).encode('utf-8'))
+    return digest.digest()
+
+def page_hashes(pdf_path: str) -> list:
+    """Hash of each page's drawing instructions and resources, in page order
+    
+    Covers the content streams plus the fonts and form XObjects they use,
+    without the layout analysis text extraction needs, so it is cheap;
+    unchanged pages hash the same.
+    """
+    hashes = []
+    memo = {}
+    with open(pdf_path, 'rb') as fp:
+        for page in PDFPage.get_pages(fp):
+            digest = hashlib.sha1(repr((page.mediabox, page.rotate)).encode('utf-8'))
+            for stream in page.contents:
+                digest.update(resolve1(stream).get_data())
+            digest.update(_object_digest(page.resources, memo))
+            hashes.append(digest.hexdigest())
+    return hashes
+
+def _extract_pages(pdf_path: str, page_numbers: set) -> dict:
+    """Extract {page number: text} for the selected pages only"""
+    with tracing.span("pdf.extract", path=pdf_path, pages=len(page_numbers)) as sp:
+        rsrcmgr = PDFResourceManager(caching=True)
+        laparams = LAParams()
+        texts = {}
+        with open(pdf_path, 'rb') as fp:
+            for page_no, page in enumerate(PDFPage.get_pages(fp)):
+                if page_no not in page_numbers:
+                    continue
+                output = io.StringIO()
+                device = TextConverter(rsrcmgr, output, laparams=laparams)
+                PDFPageInterpreter(rsrcmgr, device).process_page(page)
+                device.close()
+                # Same text extract_text gives for this page, minus its form feed
+                texts[page_no] = output.getvalue().rstrip(chunking.PAGE_BREAK)
+        sp.set(chars=sum(len(text) for text in texts.values()))
+    return texts
+
+def extract_text_chunks(pdf_path: str, chunk_size: int = 1000, overlap: int = 200) -> list:
+    """Extract text and split into semantic chunks"""
+    text = _extract_text(pdf_path)
+    if text is None:
+        return []
+    
+    with tracing.span("pdf.chunk", chunk_size=chunk_size, overlap=overlap) as sp:
+        chunks = _chunk_text(text, chunk_size, overlap)
+        sp.set(chunks=len(chunks))
+    return chunks
+
+def extract_token_chunks(pdf_path: str, max_tokens: int = None, overlap_tokens: int = CHUNK_OVERLAP_TOKENS) -> list:
+    """Extract text and split into chunks sized in model tokens.
+    
+    Returns chunk dicts ('text', 'page', 'tokens') that fit the encoder
+    window, so nothing is silently truncated at embedding time.
+    """
+    max_tokens = min(max_tokens or MAX_CHUNK_TOKENS, MAX_CHUNK_TOKENS)
+    text = _extract_text(pdf_path)
+    if text is None:
         return []
     
+    with tracing.span("pdf.chunk", max_tokens=max_tokens, overlap_tokens=overlap_tokens) as sp:
+        token_chunks = chunking.chunk_text(text, model.tokenizer, max_tokens, overlap_tokens)
+        sp.set(chunks=len(token_chunks))
+    return token_chunks
+
+def _chunk_text(text: str, chunk_size: int, overlap: int) -> list:
+    """Split cleaned text into overlapping sentence-based chunks"""
     # Clean text
     text = re.sub(r'\s+', ' ', text)
     text = re.sub(r'\n+', ' ', text)
@@ -40,19 +160,22 @@ def extract_text_chunks(pdf_path: str, chunk_size: int = 1000, overlap: int = 20
     # Create chunks with overlap
     chunks = []
     current_chunk = []
+    current_counts = []  # Word count per sentence, so overlap is never re-split
     current_length = 0
     
     for sentence in sentences:
-        words = sentence.split()
-        word_count = len(words)
+        word_count = len(sentence.split())
         
         if current_length + word_count > chunk_size and current_chunk:
             chunks.append(' '.join(current_chunk))
             # Keep overlap
-            current_chunk = current_chunk[-overlap//10:] if overlap else []
-            current_length = sum(len(s.split()) for s in current_chunk)
+            keep = overlap // 10 if overlap else 0
+            current_chunk = current_chunk[-keep:] if keep else []
+            current_counts = current_counts[-keep:] if keep else []
+            current_length = sum(current_counts)
         
         current_chunk.append(sentence)
+        current_counts.append(word_count)
         current_length += word_count
     
     if current_chunk:
@@ -60,51 +183,345 @@ def extract_text_chunks(pdf_path: str, chunk_size: int = 1000, overlap: int = 20
     
     return chunks
 
-def build_vector_index(text_chunks: list):
-    """Create FAISS index for semantic search"""
-    global vector_index, chunks
-    chunks = text_chunks
+def _split_chunks(text_chunks: list) -> tuple:
+    """Separate chunk texts from their metadata (strings carry none)"""
+    if text_chunks and isinstance(text_chunks[0], dict):
+        texts = [c['text'] for c in text_chunks]
+        meta = [{key: value for key, value in c.items() if key != 'text'} for c in text_chunks]
+    else:
+        texts = list(text_chunks)
+        meta = [{} for _ in text_chunks]
+    return texts, meta
+
+def embed_chunks(texts: list) -> np.ndarray:
+    """Encode chunk texts into L2-normalized float32 embeddings"""
+    with tracing.span("pdf.embed", chunks=len(texts)):
+        embeddings = model.encode(texts, convert_to_numpy=True)
+        embeddings = embeddings.astype('float32')
+        # Normalize for cosine similarity
+        faiss.normalize_L2(embeddings)
+    return embeddings
+
+def _new_index(dim: int):
+    """Empty inner-product index whose vectors are addressed by chunk id"""
+    return faiss.IndexIDMap2(faiss.IndexFlatIP(dim))
+
+def install_index(text_chunks: list, embeddings: np.ndarray, hashes: dict = None):
+    """Build an index from precomputed embeddings and swap it in atomically
     
-    if not chunks:
+    Searches see either the old or the new chunks, metadata and vectors,
+    never a mix. `hashes` maps each source to its page hashes, so that
+    update_document can later patch those documents page by page.
+    """
+    global vector_index, chunks, chunk_meta, page_chunks, document_hashes, _next_id
+    texts, meta = _split_chunks(text_chunks)
+    
+    with tracing.span("faiss.build", vectors=len(embeddings)):
+        # Create index
+        new_index = _new_index(embeddings.shape[1])
+        new_index.add_with_ids(embeddings, np.arange(len(texts), dtype='int64'))
+    
+    new_pages = {}
+    for chunk_id, m in enumerate(meta):
+        new_pages.setdefault((m.get('source'), m.get('page')), []).append(chunk_id)
+    
+    with _index_lock:
+        vector_index, chunks, chunk_meta = new_index, dict(enumerate(texts)), dict(enumerate(meta))
+        page_chunks, document_hashes, _next_id = new_pages, dict(hashes or {}), len(texts)
+
+def build_vector_index(text_chunks: list):
+    """Create FAISS index for semantic search from strings or token chunk dicts"""
+    if not text_chunks:
         print("No chunks to index")
         return False
     
     try:
         # Generate embeddings
-        embeddings = model.encode(chunks, convert_to_numpy=True)
-        embeddings = embeddings.astype('float32')
-        
-        # Normalize for cosine similarity
-        faiss.normalize_L2(embeddings)
-        
-        # Create index
-        vector_index = faiss.IndexFlatIP(embeddings.shape[1])
-        vector_index.add(embeddings)
+        texts, _ = _split_chunks(text_chunks)
+        install_index(text_chunks, embed_chunks(texts))
         return True
     except Exception as e:
         print(f"Index build error: {str(e)}")
         return False
 
-def retrieve_relevant_chunks(question: str, k: int = 1) -> str:
-    """Get most relevant context using semantic search"""
-    if not vector_index:
-        return ""
+def _apply_page_update(source: str, kept: dict, new_chunks: list, embeddings: np.ndarray) -> int:
+    """Patch one document's pages in the live index; caller holds _index_lock
     
-    try:
-        # Embed question
-        query_embed = model.encode([question], convert_to_numpy=True)
-        query_embed = query_embed.astype('float32')
-        faiss.normalize_L2(query_embed)
+    `kept` maps old to new page numbers for pages whose vectors stay; every
+    other page of the source is removed and `new_chunks` are added under
+    fresh ids. Returns the number of vectors removed.
+    """
+    global vector_index, _next_id
+    if vector_index is None:
+        vector_index = _new_index(model.get_sentence_embedding_dimension())
+    
+    # Detach every page of this source, keeping the ids of unchanged ones
+    moved, dropped = {}, []
+    for key in [key for key in page_chunks if key[0] == source]:
+        ids = page_chunks.pop(key)
+        if key[1] in kept:
+            moved[kept[key[1]]] = ids
+        else:
+            dropped.extend(ids)
+    
+    if dropped:
+        with tracing.span("faiss.remove", vectors=len(dropped)):
+            vector_index.remove_ids(np.array(dropped, dtype='int64'))
+        for chunk_id in dropped:
+            del chunks[chunk_id], chunk_meta[chunk_id]
+    
+    for page, ids in moved.items():
+        for chunk_id in ids:
+            chunk_meta[chunk_id]['page'] = page
+        page_chunks[(source, page)] = ids
+    
+    if new_chunks:
+        ids = np.arange(_next_id, _next_id + len(new_chunks), dtype='int64')
+        _next_id += len(new_chunks)
+        with tracing.span("faiss.add", vectors=len(ids)):
+            vector_index.add_with_ids(embeddings, ids)
+        for chunk_id, chunk in zip(ids.tolist(), new_chunks):
+            chunks[chunk_id] = chunk['text']
+            chunk_meta[chunk_id] = {'page': chunk['page'], 'tokens': chunk['tokens'], 'source': source}
+            page_chunks.setdefault((source, chunk['page']), []).append(chunk_id)
+    
+    return len(dropped)
+
+def _diff_pages(old_hashes: list, new_hashes: list) -> dict:
+    """Match two versions of a document page by page
+    
+    Returns 'kept' ({old page: new page} for unchanged content, which may
+    have moved), 'changed' ([(old page, new page)] edited in place),
+    'added' (new pages) and 'removed' (old pages).
+    """
+    diff = {'kept': {}, 'changed': [], 'added': [], 'removed': []}
+    matcher = difflib.SequenceMatcher(None, old_hashes, new_hashes, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            diff['kept'].update(zip(range(i1, i2), range(j1, j2)))
+            continue
+        paired = min(i2 - i1, j2 - j1) if tag == 'replace' else 0
+        diff['changed'].extend(zip(range(i1, i1 + paired), range(j1, j1 + paired)))
+        diff['removed'].extend(range(i1 + paired, i2))
+        diff['added'].extend(range(j1 + paired, j2))
+    return diff
+
+def update_document(pdf_path: str, source: str = None) -> dict:
+    """Index a PDF, re-embedding only the pages that changed since last time
+    
+    Page hashes are compared with the indexed version of the same source
+    (by default the absolute path). Only edited and new pages have their
+    text extracted, chunked and embedded; vectors of edited and removed
+    pages are deleted from the index in place, and unchanged pages keep
+    their vectors even if they moved. Returns page and chunk counts, or
+    None if the PDF could not be read.
+    """
+    source = source or os.path.abspath(pdf_path)
+    
+    with tracing.span("pdf.update", path=pdf_path) as sp:
+        try:
+            new_hashes = page_hashes(pdf_path)
+        except Exception as e:
+            print(f"PDF extraction error: {str(e)}")
+            return None
         
-        # Search index
-        distances, indices = vector_index.search(query_embed, k)
+        while True:
+            with _index_lock:
+                old_hashes = document_hashes.get(source)
+            diff = _diff_pages(old_hashes or [], new_hashes)
+            pages = {new for _, new in diff['changed']} | set(diff['added'])
+            
+            new_chunks, embeddings = [], None
+            if pages:
+                try:
+                    page_texts = _extract_pages(pdf_path, pages)
+                except Exception as e:
+                    print(f"PDF extraction error: {str(e)}")
+                    return None
+                with tracing.span("pdf.chunk", pages=len(pages)) as chunk_span:
+                    new_chunks = chunking.chunk_pages(page_texts, model.tokenizer,
+                                                      MAX_CHUNK_TOKENS, CHUNK_OVERLAP_TOKENS)
+                    chunk_span.set(chunks=len(new_chunks))
+            if new_chunks:
+                embeddings = embed_chunks([c['text'] for c in new_chunks])
+            
+            with _index_lock:
+                if document_hashes.get(source) != old_hashes:
+                    continue  # Another update of this source landed first; diff against it
+                removed = _apply_page_update(source, diff['kept'], new_chunks, embeddings)
+                document_hashes[source] = new_hashes
+                total = sum(len(ids) for (src, _), ids in page_chunks.items() if src == source)
+            break
         
-        # Return best context
-        return "\n".join([chunks[i] for i in indices[0] if i < len(chunks)])
-    except:
-        return ""
+        result = {
+            'pages': len(new_hashes),
+            'changed': len(diff['changed']),
+            'added': len(diff['added']),
+            'removed': len(diff['removed']),
+            'chunks_embedded': len(new_chunks),
+            'chunks_removed': removed,
+            'chunks': total,
+        }
+        sp.set(**result)
+    return result
+
+def remove_document(source: str) -> int:
+    """Drop every chunk of a source from the index; returns how many were removed"""
+    with _index_lock:
+        document_hashes.pop(source, None)
+        return _apply_page_update(source, {}, [], None)
+
+def document_chunks(source: str) -> tuple:
+    """Chunk dicts, embeddings and page hashes of one indexed source, in reading order"""
+    with _index_lock:
+        pages = sorted((page for src, page in page_chunks if src == source), key=lambda page: page or 0)
+        ids = [chunk_id for page in pages for chunk_id in page_chunks[(source, page)]]
+        doc_chunks = [dict(chunk_meta[chunk_id], text=chunks[chunk_id]) for chunk_id in ids]
+        if ids:
+            embeddings = vector_index.reconstruct_batch(np.array(ids, dtype='int64'))
+        else:
+            embeddings = np.zeros((0, model.get_sentence_embedding_dimension()), dtype='float32')
+        return doc_chunks, embeddings, list(document_hashes.get(source, []))
 
-def ask_gemini(question: str, context: str = ""):
+def mmr_select(query_vec: np.ndarray, candidate_vecs: np.ndarray, k: int, lambda_mult: float = 0.5) -> list:
+    """Pick k candidate positions by Maximal Marginal Relevance.
+    
+    Vectors must be L2-normalized. Each step is one matrix-vector product,
+    so selecting from hundreds of candidates stays well under a millisecond.
+    """
+    n = len(candidate_vecs)
+    k = min(k, n)
+    if k <= 0:
+        return []
+    
+    relevance = candidate_vecs @ query_vec
+    max_redundancy = np.full(n, -np.inf, dtype=np.float32)
+    available = np.ones(n, dtype=bool)
+    selected = []
+    
+    for _ in range(k):
+        if selected:
+            scores = lambda_mult * relevance - (1 - lambda_mult) * max_redundancy
+        else:
+            scores = relevance.copy()
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        available[best] = False
+        np.maximum(max_redundancy, candidate_vecs @ candidate_vecs[best], out=max_redundancy)
+    
+    return selected
+
+def _expand_neighbors(chunk_id: int, window: int) -> tuple:
+    """(page key, first, last) positions of up to `window` chunks either side of chunk_id on its page"""
+    meta = chunk_meta[chunk_id]
+    key = (meta.get('source'), meta.get('page'))
+    ids = page_chunks[key]
+    pos = ids.index(chunk_id)
+    return key, max(0, pos - window), min(len(ids) - 1, pos + window)
+
+def _join_overlapping(texts: list) -> str:
+    """Join consecutive chunks, dropping the overlap each one repeats from the previous
+    
+    Overlap is always whole trailing sentences, so it is the longest
+    suffix of one chunk that starts a sentence and also starts the next.
+    """
+    merged = texts[0] if texts else ''
+    for prev, text in zip(texts, texts[1:]):
+        skip = 0
+        for start in [0] + [m.end() for m in chunking.SENTENCE_RE.finditer(prev)]:
+            suffix = prev[start:]
+            if suffix and text.startswith(suffix) and (len(suffix) == len(text) or text[len(suffix)] == ' '):
+                skip = len(suffix)
+                break
+        rest = text[skip:].lstrip()
+        if rest:
+            merged += ' ' + rest
+    return merged
+
+def search_chunks(question: str, k: int = 3, fetch_k: int = 20, mmr: bool = True,
+                  lambda_mult: float = 0.5, expand_neighbors: int = 0) -> list:
+    """Semantic search returning scored hits with metadata.
+    
+    With mmr=True, fetch_k nearest chunks are re-ranked by Maximal Marginal
+    Relevance over their stored vectors so overlapping near-duplicates do
+    not crowd out other passages. expand_neighbors=n merges up to n
+    adjacent chunks from the same page into each hit's text, without
+    repeating their overlap; hits whose spans meet are merged into one.
+    """
+    with _index_lock:
+        if vector_index is None or vector_index.ntotal == 0:
+            return []
+    
+    try:
+        with tracing.span("pdf.search", k=k, fetch_k=fetch_k, mmr=mmr) as sp:
+            # Embed question
+            with tracing.span("pdf.embed_query"):
+                query_embed = model.encode([question], convert_to_numpy=True)
+                query_embed = query_embed.astype('float32')
+                faiss.normalize_L2(query_embed)
+            
+            # Updates patch the index in place, so search under the lock
+            with _index_lock:
+                fetch = min(max(k, fetch_k) if mmr else k, vector_index.ntotal)
+                if fetch == 0:
+                    return []
+                with tracing.span("faiss.search", k=fetch):
+                    distances, ids = vector_index.search(query_embed, fetch)
+                
+                valid = ids[0] >= 0
+                candidates, scores = ids[0][valid], distances[0][valid]
+                
+                if mmr and len(candidates) > k:
+                    with tracing.span("pdf.mmr", candidates=len(candidates)):
+                        order = mmr_select(query_embed[0], vector_index.reconstruct_batch(candidates),
+                                           k, lambda_mult)
+                else:
+                    order = range(min(k, len(candidates)))
+                
+                hits, spans = [], []
+                for pos in order:
+                    chunk_id = int(candidates[pos])
+                    meta = chunk_meta[chunk_id]
+                    hit = {
+                        'index': chunk_id,
+                        'score': float(scores[pos]),
+                        'text': chunks[chunk_id],
+                        'page': meta.get('page'),
+                        'source': meta.get('source'),
+                    }
+                    if expand_neighbors:
+                        key, first, last = _expand_neighbors(chunk_id, expand_neighbors)
+                        # Fold into the better hits whose spans overlap or touch this one
+                        touching = [i for i, (other_key, other_first, other_last) in enumerate(spans)
+                                    if other_key == key and first <= other_last + 1 and last >= other_first - 1]
+                        if touching:
+                            first = min([first] + [spans[i][1] for i in touching])
+                            last = max([last] + [spans[i][2] for i in touching])
+                            hit = hits[touching[0]]
+                            spans[touching[0]] = (key, first, last)
+                            for i in reversed(touching[1:]):
+                                del hits[i], spans[i]
+                        else:
+                            hits.append(hit)
+                            spans.append((key, first, last))
+                        span_ids = page_chunks[key][first:last + 1]
+                        hit['text'] = _join_overlapping([chunks[i] for i in span_ids])
+                        hit['span'] = span_ids
+                    else:
+                        hits.append(hit)
+            sp.set(hits=len(hits))
+            return hits
+    except Exception as e:
+        print(f"Search error: {str(e)}")
+        return []
+
+def retrieve_relevant_chunks(question: str, k: int = 1) -> str:
+    """Get most relevant context using semantic search"""
+    hits = search_chunks(question, k=k, mmr=k > 1)
+    return "\n".join(hit['text'] for hit in hits)
+
+def ask_gemini(question: str, context: str = "", max_context_length: int = 1500, max_output_tokens: int = 500):
     """Call Gemini API with quota tracking"""
     global QUOTA_USED
     
@@ -112,12 +529,12 @@ def ask_gemini(question: str, context: str = ""):
         return {"error": "Daily quota exhausted"}
     
     # Use the latest model names
-    url = f"https://generativelanguage.googleapis.com/v1beta/models/gemini-1.5-flash:generateContent?key={API_KEY}"
+    url = f"{GEMINI_API_BASE}/v1beta/models/gemini-1.5-flash:generateContent?key={API_KEY}"
     
     headers = {'Content-Type': 'application/json'}
     
     # Build efficient prompt
-    prompt = f"Based ONLY on this context:\n{context[:1500]}\n\n" if context else ""
+    prompt = f"Based ONLY on this context:\n{context[:max_context_length]}\n\n" if context else ""
     prompt += f"Answer this: {question}"
     
     data = {
@@ -125,15 +542,24 @@ def ask_gemini(question: str, context: str = ""):
             "parts": [{"text": prompt}]
         }],
         "generationConfig": {
-            "maxOutputTokens": 500,
+            "maxOutputTokens": max_output_tokens,
             "temperature": 0.3
         }
     }
     
     try:
-        response = requests.post(url, headers=headers, json=data)
-        QUOTA_USED += 1
-        return response.json()
+        with tracing.span("gemini.request", prompt_chars=len(prompt)) as sp:
+            response = requests.post(url, headers=headers, json=data)
+            QUOTA_USED += 1
+            result = response.json()
+            
+            usage = result.get('usageMetadata', {}) if isinstance(result, dict) else {}
+            tokens = usage.get('promptTokenCount') or tracing.estimate_tokens(prompt)
+            sp.set(status=response.status_code, tokens_sent=tokens)
+            tracing.incr("quota_used", api="gemini")
+            tracing.incr("tokens_sent", tokens, api="gemini")
+            tracing.incr("bytes_fetched", len(response.content), source="gemini")
+            return result
     except Exception as e:
         return {"error": f"API request failed: {str(e)}"}
 
@@ -164,7 +590,7 @@ if __name__ == "__main__":
     pdf_path = input("Enter PDF path: ").strip()
     
     print("Processing PDF...")
-    chunks = extract_text_chunks(pdf_path)
+    chunks = extract_token_chunks(pdf_path)
     if not chunks:
         print("Failed to extract text from PDF. Exiting.")
         exit()
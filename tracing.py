@@ -0,0 +1,265 @@
+import os
+import json
+import time
+import uuid
+import threading
+import functools
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from dotenv import load_dotenv
+
+# Load environment
+load_dotenv()
+TRACE_FILE = os.getenv("TRACE_FILE")      # JSON-lines span/counter log
+METRICS_PORT = os.getenv("METRICS_PORT")  # Prometheus-style /metrics endpoint
+ENABLED = bool(TRACE_FILE or METRICS_PORT)
+
+METRIC_PREFIX = "smart_assistant"
+
+_lock = threading.Lock()
+_local = threading.local()
+_trace_handle = None
+_counters = {}       # (name, labels) -> value
+_span_totals = {}    # span name -> [count, total_seconds]
+_metrics_server = None
+
+
+class _NullSpan:
+    """Shared no-op span used while tracing is disabled"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set(self, **attrs):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    """Timed, nestable section of work"""
+
+    def __init__(self, name: str, attrs: dict):
+        self.name = name
+        self.attrs = attrs
+        self.span_id = uuid.uuid4().hex[:16]
+        self.trace_id = None
+        self.parent_id = None
+
+    def set(self, **attrs):
+        """Attach extra attributes discovered while the span is running"""
+        self.attrs.update(attrs)
+
+    def __enter__(self):
+        stack = _span_stack()
+        if stack:
+            self.parent_id = stack[-1].span_id
+            self.trace_id = stack[-1].trace_id
+        else:
+            self.trace_id = uuid.uuid4().hex
+        stack.append(self)
+        self.wall_start = time.time()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration = time.perf_counter() - self.start
+        stack = _span_stack()
+        if stack and stack[-1] is self:
+            stack.pop()
+
+        with _lock:
+            totals = _span_totals.setdefault(self.name, [0, 0.0])
+            totals[0] += 1
+            totals[1] += duration
+
+        record = {
+            "type": "span",
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start": self.wall_start,
+            "duration_ms": round(duration * 1000, 3),
+            "attrs": self.attrs,
+        }
+        if exc_type is not None:
+            record["error"] = f"{exc_type.__name__}: {exc}"
+        _write_record(record)
+        return False
+
+
+def _span_stack() -> list:
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+    return stack
+
+
+def _write_record(record: dict):
+    """Append one JSON line to the trace file (if configured)"""
+    global _trace_handle
+    if not TRACE_FILE:
+        return
+
+    line = json.dumps(record, default=str)
+    with _lock:
+        try:
+            if _trace_handle is None:
+                _trace_handle = open(TRACE_FILE, "a", encoding="utf-8")
+            _trace_handle.write(line + "\n")
+            _trace_handle.flush()
+        except OSError as e:
+            print(f"Trace write error: {str(e)}")
+
+
+def span(name: str, **attrs):
+    """Time a block of work: `with tracing.span("pdf.embed", chunks=n):`"""
+    if not ENABLED:
+        return _NULL_SPAN
+    return _Span(name, attrs)
+
+
+def traced(name: str):
+    """Decorator that wraps every call of a function in a span"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not ENABLED:
+                return func(*args, **kwargs)
+            with _Span(name, {}):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def incr(name: str, value: float = 1, **labels):
+    """Increase a counter such as quota_used, bytes_fetched or tokens_sent"""
+    if not ENABLED:
+        return
+
+    key = (name, tuple(sorted(labels.items())))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+    if TRACE_FILE:
+        stack = _span_stack()
+        _write_record({
+            "type": "counter",
+            "name": name,
+            "value": value,
+            "labels": labels,
+            "span_id": stack[-1].span_id if stack else None,
+            "time": time.time(),
+        })
+
+
+def enable(trace_file: str = None):
+    """Turn tracing on at runtime, optionally redirecting the JSON-lines output"""
+    global ENABLED, TRACE_FILE, _trace_handle
+    with _lock:
+        if trace_file and trace_file != TRACE_FILE:
+            if _trace_handle is not None:
+                _trace_handle.close()
+                _trace_handle = None
+            TRACE_FILE = trace_file
+        ENABLED = True
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count for prompts (~4 characters per token)"""
+    return max(1, len(text) // 4) if text else 0
+
+
+def get_counters() -> dict:
+    """Snapshot of counters keyed by (name, labels)"""
+    with _lock:
+        return dict(_counters)
+
+
+def get_span_totals() -> dict:
+    """Snapshot of {span name: (count, total_seconds)}"""
+    with _lock:
+        return {name: tuple(totals) for name, totals in _span_totals.items()}
+
+
+def reset():
+    """Clear all collected metrics"""
+    with _lock:
+        _counters.clear()
+        _span_totals.clear()
+
+
+def _format_labels(labels) -> str:
+    if not labels:
+        return ""
+    parts = []
+    for key, value in labels:
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", " ")
+        parts.append(f'{key}="{value}"')
+    return "{" + ",".join(parts) + "}"
+
+
+def render_prometheus() -> str:
+    """Render counters and span timings in Prometheus text exposition format"""
+    lines = []
+    counters = get_counters()
+
+    for name in sorted({name for name, _ in counters}):
+        metric = f"{METRIC_PREFIX}_{name}_total"
+        lines.append(f"# TYPE {metric} counter")
+        for (counter_name, labels), value in sorted(counters.items()):
+            if counter_name == name:
+                lines.append(f"{metric}{_format_labels(labels)} {value:g}")
+
+    totals = get_span_totals()
+    if totals:
+        metric = f"{METRIC_PREFIX}_span_seconds"
+        lines.append(f"# TYPE {metric} summary")
+        for name, (count, seconds) in sorted(totals.items()):
+            labels = _format_labels((("span", name),))
+            lines.append(f"{metric}_sum{labels} {seconds:.6f}")
+            lines.append(f"{metric}_count{labels} {count}")
+
+    return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.rstrip("/") not in ("", "/metrics"):
+            self.send_error(404)
+            return
+        body = render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # Keep the CLI output clean
+
+
+def start_metrics_server(port: int = None):
+    """Serve /metrics on a daemon thread; uses METRICS_PORT when no port is given"""
+    global _metrics_server, ENABLED
+    if _metrics_server is not None:
+        return _metrics_server
+
+    port = port if port is not None else METRICS_PORT
+    if not port:
+        return None
+
+    try:
+        _metrics_server = ThreadingHTTPServer(("127.0.0.1", int(port)), _MetricsHandler)
+    except (OSError, ValueError) as e:
+        print(f"Metrics server error: {str(e)}")
+        return None
+
+    ENABLED = True
+    thread = threading.Thread(target=_metrics_server.serve_forever, daemon=True)
+    thread.start()
+    return _metrics_server
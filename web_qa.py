@@ -5,11 +5,15 @@ import re
 import time
 import os
 from dotenv import load_dotenv
+import tracing
+import web_store
 
 # Load environment
 load_dotenv()
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
 GOOGLE_CSE_ID = os.getenv("GOOGLE_CSE_ID")
+GOOGLE_SEARCH_URL = os.getenv("GOOGLE_SEARCH_URL", "https://www.googleapis.com/customsearch/v1")
+SCRAPE_DELAY = 1  # Seconds between scrapes, to be polite to servers
 
 # Track web-specific quota usage
 WEB_QUOTA_USED = 0
@@ -21,7 +25,7 @@ def google_search(query: str, num_results: int = 3) -> list:
         print("Google API credentials missing. Please set GOOGLE_API_KEY and GOOGLE_CSE_ID in .env")
         return []
     
-    base_url = "https://www.googleapis.com/customsearch/v1"
+    base_url = GOOGLE_SEARCH_URL
     params = {
         'key': GOOGLE_API_KEY,
         'cx': GOOGLE_CSE_ID,
@@ -30,9 +34,13 @@ def google_search(query: str, num_results: int = 3) -> list:
     }
     
     try:
-        response = requests.get(base_url, params=params, timeout=10)
-        response.raise_for_status()
-        data = response.json()
+        with tracing.span("web.google_search", query=query, num_results=num_results) as sp:
+            response = requests.get(base_url, params=params, timeout=10)
+            tracing.incr("quota_used", api="custom_search")
+            tracing.incr("bytes_fetched", len(response.content), source="custom_search")
+            response.raise_for_status()
+            data = response.json()
+            sp.set(results=len(data.get('items', [])))
         
         results = []
         for item in data.get('items', []):
@@ -60,6 +68,7 @@ def clean_text(text: str) -> str:
     text = re.sub(r'[^\w\s.,;:!?\-()\[\]{}"\'\/]', '', text)
     return text.strip()
 
+@tracing.traced("web.scrape")
 def scrape_website(url: str) -> str:
     """Scrape main content from a website with robust error handling"""
     try:
@@ -71,52 +80,74 @@ def scrape_website(url: str) -> str:
             'Upgrade-Insecure-Requests': '1'
         }
         
-        response = requests.get(url, headers=headers, timeout=15)
-        response.raise_for_status()
+        with tracing.span("web.fetch", url=url) as sp:
+            response = requests.get(url, headers=headers, timeout=15)
+            sp.set(status=response.status_code, bytes=len(response.content))
+            tracing.incr("bytes_fetched", len(response.content), source="scrape")
+            response.raise_for_status()
         
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        # Remove unnecessary elements
-        for element in soup(['header', 'footer', 'nav', 'aside', 'script', 'style', 'noscript', 'svg']):
-            element.decompose()
-        
-        # Extract main content using common patterns
-        content_selectors = [
-            'article',
-            'main',
-            '.content',
-            '.article-body',
-            '.post-content',
-            '#content'
-        ]
-        
-        for selector in content_selectors:
-            article = soup.select_one(selector)
-            if article:
-                content = article.get_text()
-                break
-        else:
-            # Fallback to body if no specific content found
-            content = soup.find('body').get_text() if soup.find('body') else soup.get_text()
-        
-        return clean_text(content)[:15000]  # Limit to 15k characters
+        with tracing.span("web.parse", url=url):
+            return _extract_main_content(response.text)
     
     except Exception as e:
         print(f"Scraping error for {url}: {str(e)}")
         return ""
 
-def web_search_and_summarize(query: str, num_results: int = 3) -> str:
-    """Search the web and summarize results using Gemini"""
+def _extract_main_content(html: str) -> str:
+    """Pull the main readable text out of an HTML page"""
+    soup = BeautifulSoup(html, 'html.parser')
+    
+    # Remove unnecessary elements
+    for element in soup(['header', 'footer', 'nav', 'aside', 'script', 'style', 'noscript', 'svg']):
+        element.decompose()
+    
+    # Extract main content using common patterns
+    content_selectors = [
+        'article',
+        'main',
+        '.content',
+        '.article-body',
+        '.post-content',
+        '#content'
+    ]
+    
+    for selector in content_selectors:
+        article = soup.select_one(selector)
+        if article:
+            content = article.get_text()
+            break
+    else:
+        # Fallback to body if no specific content found
+        content = soup.find('body').get_text() if soup.find('body') else soup.get_text()
+    
+    return clean_text(content)[:15000]  # Limit to 15k characters
+
+def _store_page(url: str, title: str, content: str, query: str):
+    """Keep scraped text in the local web store; never fails the search"""
+    try:
+        return web_store.add_page(url, title, content, query) > 0
+    except Exception as e:
+        print(f"  Could not store page in web store: {str(e)}")
+        return False
+
+def gather_web_sources(query: str, num_results: int = 3, sources: list = None) -> list:
+    """Search the web and scrape results into cited source sections
+
+    If `sources` is given, one {'url', 'content', 'stored'} dict per section
+    is appended to it; 'stored' says whether the page reached the web store.
+    """
     global WEB_QUOTA_USED
     
     if WEB_QUOTA_USED >= MAX_WEB_QUOTA:
-        return "Web search quota exhausted for today"
+        print("Web search quota exhausted for today")
+        return []
     
     print(f" Searching the web for: {query}")
     search_results = google_search(query, num_results)
     
     if not search_results:
-        return "No search results found. Try a different query."
+        return []
+    WEB_QUOTA_USED += 1
     
     print(f" Found {len(search_results)} results. Processing content...")
     contents = []
@@ -126,17 +157,44 @@ def web_search_and_summarize(query: str, num_results: int = 3) -> str:
         
         # Try to scrape content, but use snippet if scraping fails
         content = scrape_website(result['url'])
-        if not content:
+        stored = False
+        if content:
+            stored = _store_page(result['url'], result['title'], content, query)
+        else:
             print("  Using snippet instead of full content")
             content = result.get('snippet', '') + " [Source: " + result['url'] + "]"
         
         if content:
             contents.append(f"# Source: {result['title']} ({result['url']})\n{content}\n")
-        time.sleep(1)  # Be polite to servers
+            if sources is not None:
+                sources.append({'url': result['url'], 'content': contents[-1], 'stored': stored})
+        time.sleep(SCRAPE_DELAY)  # Be polite to servers
+    
+    return contents
+
+@tracing.traced("web.search_and_summarize")
+def web_search_and_summarize(query: str, num_results: int = 3, prefer_local: bool = False) -> str:
+    """Search the web and summarize results using Gemini
     
-    if not contents:
-        return "Could not retrieve content from any sources."
+    With prefer_local=True, fresh high-scoring passages from the local web
+    store are used instead of a live search when available.
+    """
+    hits = web_store.lookup(query) if prefer_local else []
+    if hits:
+        print(f" Using {len(hits)} stored web passages for: {query}")
+        contents = [web_store.format_hits(hits)]
+    else:
+        if WEB_QUOTA_USED >= MAX_WEB_QUOTA:
+            return "Web search quota exhausted for today"
+        
+        contents = gather_web_sources(query, num_results)
+        if not contents:
+            return "No search results found. Try a different query."
     
+    return summarize_sources(query, contents)
+
+def summarize_sources(query: str, contents: list) -> str:
+    """Ask Gemini for a cited digest of already gathered source sections"""
     context = "\n\n".join(contents)
     print(f"Context size: {len(context)} characters")
     
@@ -149,5 +207,4 @@ def web_search_and_summarize(query: str, num_results: int = 3) -> str:
     )
     
     response = ask_gemini(prompt, max_context_length=30000)
-    WEB_QUOTA_USED += 1
     return format_response(response)
\ No newline at end of file
@@ -0,0 +1,212 @@
+import os
+import time
+import sqlite3
+import threading
+import numpy as np
+import faiss
+from dotenv import load_dotenv
+import pdf_qa
+import chunking
+import tracing
+
+# Load environment
+load_dotenv()
+WEB_STORE_DIR = os.getenv("WEB_STORE_DIR", "web_store")
+MIN_SCORE = float(os.getenv("WEB_STORE_MIN_SCORE", "0.55"))       # Cosine similarity for a usable hit
+MAX_AGE_HOURS = float(os.getenv("WEB_STORE_MAX_AGE_HOURS", "168"))  # Older pages count as stale
+
+_lock = threading.RLock()
+_conn = None
+_index = None
+
+
+def _paths():
+    return (os.path.join(WEB_STORE_DIR, "web_store.db"),
+            os.path.join(WEB_STORE_DIR, "web_store.faiss"))
+
+
+def _load():
+    """Open the metadata database and FAISS index, creating them if needed"""
+    global _conn, _index
+    if _conn is not None:
+        return
+
+    os.makedirs(WEB_STORE_DIR, exist_ok=True)
+    db_path, index_path = _paths()
+    _conn = sqlite3.connect(db_path, check_same_thread=False)
+    c = _conn.cursor()
+    c.execute('''CREATE TABLE IF NOT EXISTS pages (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                url TEXT NOT NULL UNIQUE,
+                title TEXT,
+                query TEXT,
+                fetched_at REAL NOT NULL)''')
+    c.execute('''CREATE TABLE IF NOT EXISTS chunks (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                page_id INTEGER NOT NULL REFERENCES pages(id),
+                text TEXT NOT NULL)''')
+    c.execute("CREATE INDEX IF NOT EXISTS idx_chunks_page ON chunks(page_id)")
+    _conn.commit()
+
+    if os.path.exists(index_path):
+        try:
+            _index = faiss.read_index(index_path)
+        except Exception as e:
+            print(f"Web store index unreadable, starting empty: {str(e)}")
+            _index = None
+    if _index is None:
+        dim = pdf_qa.model.get_sentence_embedding_dimension()
+        _index = faiss.IndexIDMap(faiss.IndexFlatIP(dim))
+
+
+def _save_index():
+    """Write the index atomically so a crash never leaves a torn file"""
+    _, index_path = _paths()
+    tmp_path = index_path + ".tmp"
+    faiss.write_index(_index, tmp_path)
+    os.replace(tmp_path, index_path)
+
+
+def _evict_stale(c: sqlite3.Cursor) -> int:
+    """Drop pages older than MAX_AGE_HOURS and their vectors; caller holds _lock"""
+    oldest = time.time() - MAX_AGE_HOURS * 3600
+    old_ids = [r[0] for r in c.execute(
+        "SELECT chunks.id FROM chunks JOIN pages ON pages.id = chunks.page_id WHERE pages.fetched_at < ?",
+        (oldest,))]
+    if old_ids:
+        _index.remove_ids(np.array(old_ids, dtype='int64'))
+    c.execute("DELETE FROM chunks WHERE page_id IN (SELECT id FROM pages WHERE fetched_at < ?)", (oldest,))
+    c.execute("DELETE FROM pages WHERE fetched_at < ?", (oldest,))
+    return c.rowcount
+
+
+def add_page(url: str, title: str, text: str, query: str = None) -> int:
+    """Chunk, embed and store a scraped page; replaces any earlier copy of the URL
+
+    Pages older than MAX_AGE_HOURS are evicted at the same time, so the
+    store only holds content that searches can still use.
+    """
+    if not text:
+        return 0
+
+    page_chunks = chunking.chunk_text(text, pdf_qa.model.tokenizer,
+                                      pdf_qa.MAX_CHUNK_TOKENS, pdf_qa.CHUNK_OVERLAP_TOKENS)
+    if not page_chunks:
+        return 0
+
+    with tracing.span("web_store.add", url=url, chunks=len(page_chunks)):
+        embeddings = pdf_qa.model.encode([c['text'] for c in page_chunks], convert_to_numpy=True)
+        embeddings = embeddings.astype('float32')
+        faiss.normalize_L2(embeddings)
+
+        with _lock:
+            _load()
+            c = _conn.cursor()
+            evicted = _evict_stale(c)
+            if evicted:
+                tracing.incr("web_store_evicted_pages", evicted)
+            row = c.execute("SELECT id FROM pages WHERE url = ?", (url,)).fetchone()
+            if row:
+                old_ids = [r[0] for r in c.execute("SELECT id FROM chunks WHERE page_id = ?", (row[0],))]
+                if old_ids:
+                    _index.remove_ids(np.array(old_ids, dtype='int64'))
+                c.execute("DELETE FROM chunks WHERE page_id = ?", (row[0],))
+                c.execute("UPDATE pages SET title = ?, query = ?, fetched_at = ? WHERE id = ?",
+                          (title, query, time.time(), row[0]))
+                page_id = row[0]
+            else:
+                c.execute("INSERT INTO pages (url, title, query, fetched_at) VALUES (?, ?, ?, ?)",
+                          (url, title, query, time.time()))
+                page_id = c.lastrowid
+
+            ids = []
+            for chunk in page_chunks:
+                c.execute("INSERT INTO chunks (page_id, text) VALUES (?, ?)", (page_id, chunk['text']))
+                ids.append(c.lastrowid)
+            _index.add_with_ids(embeddings, np.array(ids, dtype='int64'))
+            _conn.commit()
+            _save_index()
+
+    return len(page_chunks)
+
+
+def search(query: str, k: int = 3, max_age_hours: float = MAX_AGE_HOURS, urls=None) -> list:
+    """Return up to k stored passages for query, newest-enough only, best first
+
+    `urls` restricts the passages to those pages.
+    """
+    with _lock:
+        _load()
+        if _index.ntotal == 0:
+            return []
+
+    with tracing.span("web_store.search", k=k) as sp:
+        query_embed = pdf_qa.model.encode([query], convert_to_numpy=True).astype('float32')
+        faiss.normalize_L2(query_embed)
+
+        oldest = time.time() - max_age_hours * 3600
+        urls = set(urls) if urls is not None else None
+        fetch = k * 4
+        with _lock:
+            while True:
+                # Over-fetch so stale pages can be filtered out, widening until
+                # k fresh hits are found or the whole index has been seen
+                fetch = min(_index.ntotal, fetch)
+                scores, ids = _index.search(query_embed, fetch)
+                found = [(int(i), float(s)) for i, s in zip(ids[0], scores[0]) if i >= 0]
+                if not found:
+                    return []
+
+                placeholders = ",".join("?" * len(found))
+                rows = _conn.execute(
+                    f'''SELECT chunks.id, chunks.text, pages.url, pages.title, pages.fetched_at
+                        FROM chunks JOIN pages ON pages.id = chunks.page_id
+                        WHERE chunks.id IN ({placeholders})''',
+                    [i for i, _ in found],
+                ).fetchall()
+
+                by_id = {row[0]: row for row in rows}
+                hits = []
+                for chunk_id, score in found:
+                    row = by_id.get(chunk_id)
+                    if row is None or row[4] < oldest or (urls is not None and row[2] not in urls):
+                        continue
+                    hits.append({
+                        'text': row[1],
+                        'score': score,
+                        'url': row[2],
+                        'title': row[3],
+                        'fetched_at': row[4],
+                    })
+                    if len(hits) == k:
+                        break
+                if len(hits) == k or fetch >= _index.ntotal:
+                    break
+                fetch *= 4
+
+        sp.set(hits=len(hits), fetched=fetch)
+        return hits
+
+
+def lookup(query: str, k: int = 3, min_score: float = MIN_SCORE, max_age_hours: float = MAX_AGE_HOURS) -> list:
+    """Fresh hits scoring at least min_score, or [] when live search is needed"""
+    hits = [hit for hit in search(query, k, max_age_hours) if hit['score'] >= min_score]
+    tracing.incr("cache_hits" if hits else "cache_misses", cache="web_store")
+    return hits
+
+
+def format_hits(hits: list) -> str:
+    """Render hits as cited context, in the same shape as live web sources"""
+    sections = []
+    for hit in hits:
+        fetched = time.strftime('%Y-%m-%d', time.localtime(hit['fetched_at']))
+        sections.append(f"# Source: {hit['title']} ({hit['url']}, fetched {fetched})\n{hit['text']}\n")
+    return "\n\n".join(sections)
+
+
+def stats() -> dict:
+    """Number of stored pages and indexed passages"""
+    with _lock:
+        _load()
+        pages = _conn.execute("SELECT COUNT(*) FROM pages").fetchone()[0]
+        return {'pages': pages, 'passages': _index.ntotal}